@@ -225,7 +225,6 @@ ts.resample('D').mean()
 
 
 
-import pandas as pd
 
 
 
@@ -394,8 +393,8 @@ edu.max(axis=0)
 # In[35]:
 
 
-print"Pandas max function:", edu["Value"].max()
-print"Python max function:", max(edu["Value"])
+print("Pandas max function:", edu["Value"].max())
+print("Python max function:", max(edu["Value"]))
 
 
 # Beside these aggregation functions, we can apply operations over all the values in rows, columns or a selection of both. The rule of thumb is that an operation between columns means that it is applied to each row in that column and an operation between rows means that it is applied to each column in that row. For example we can apply any binary arithmetical operation (+,-,*,/) to an entire row:
@@ -485,10 +484,25 @@ eduDrop.head()
 # In[45]:
 
 
-eduFilled  = edu.fillna(value={"Value":0}) 
+eduFilled  = edu.fillna(value={"Value":0})
 eduFilled.head()
 
 
+# Each of these operations returns a new DataFrame, so on wide extracts every step copies all the data. The `masked` module keeps the columns as they are and tracks the nulls in a bitmap (one bit per row): **isnull** returns the bitmap, **dropna** returns a view of the selected rows and **fillna** is applied when the values are read. Data is only copied when we ask for a DataFrame with **to_frame**, and `copies.bytes_copied` tells us how much was copied:
+
+# In[ ]:
+
+
+import masked
+
+medu = masked.MaskedFrame.from_frame(edu)
+print("Nulls:", medu.isnull("Value").count())
+print("Mean without nulls:", medu.dropna(subset=["Value"])["Value"].mean())
+print("Mean with nulls as 0:", medu.fillna(value={"Value":0})["Value"].mean())
+print("Bytes copied:", masked.copies.bytes_copied)
+medu.fillna(value={"Value":0}).to_frame().head()
+
+
 # ## Sorting
 
 # Another important functionality we will need when inspecting our data is to sort by columns. We can sort a DataFrame using any column, using the **sort** function.  If we want to see the first five rows of data sorted in descending order  (i.e., from the largest to the smallest values) and using the *"Value"* column, then we just need to do this:
@@ -599,8 +613,11 @@ totalSum.rank(ascending=False,method='dense').sort_values().head()
 # In[54]:
 
 
-get_ipython().magic('matplotlib inline')
-import matplotlib.pylab as plt
+try:
+    get_ipython().run_line_magic('matplotlib', 'inline')
+except NameError:                              # running as a plain script
+    pass
+import matplotlib.pyplot as plt
 
 fig = plt.figure(figsize=(12,5))
 totalSum=pivedu.sum(axis=1).sort_values(ascending=False)
@@ -726,8 +743,6 @@ plt.show()
 # In[57]:
 
 
-import pandas as pd
-
 users_data =  'ml-1m/users.dat'
 ratings_data = 'ml-1m/ratings.dat'
 movies_data =  'ml-1m/movies.dat'
@@ -748,7 +763,19 @@ movies = pd.read_table(movies_data, sep='::', header=None, names=mnames,  engine
 
 
 data = pd.merge(pd.merge(ratings, users), movies)
-print data[:30]
+print(data[:30])
+
+
+# The three files (and the Eurostat file of the first part) are independent, so they can be read at the same time. The `loaders` module declares every file as a `Source` and the merge as a `Join`; the files are read concurrently in a pool, the merge starts as soon as its three inputs are ready and the time spent on each step is reported:
+
+# In[ ]:
+
+
+from loaders import load_all, format_timings
+
+loaded = load_all(movielens_dir='ml-1m', eurostat_path='educ_figdp/educ_figdp_1_Data.csv')
+users, ratings, movies, data = [loaded.frames[k] for k in ('users', 'ratings', 'movies', 'data')]
+print(format_timings(loaded.timings))
 
 
 # # Hands on
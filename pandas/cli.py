@@ -0,0 +1,324 @@
+# coding: utf-8
+"""Command line entry point, one sub-command per task of the notebook.
+
+    python cli.py etl [--csv PATH] [--since YEAR] [--output CSV]
+    python cli.py movielens top USER [--n N]
+    python cli.py movielens popular [--min-ratings N]
+    python cli.py plot {total,by-year} --output PNG
+    python cli.py load [--executor thread|process]
+    python cli.py cube {build,update,query} [--by DIM...] [--where DIM=V...]
+    python cli.py partitions {build,append,per-day,rolling,report} [--last-days N]
+    python cli.py sqlload [--db FILE] [--batch-size N] [--upsert]
+    python cli.py serve [--port N] [--window-ms MS]   (see loadtest.py)
+    python cli.py startup [--runs N] [--target SECONDS]
+
+Only the standard library is imported at start-up; pandas and matplotlib are
+imported by the commands that use them, so ``--help`` and ``startup`` do not
+pay for them.  ``startup`` measures the cold start of this script and fails
+when it is above the target.  ``etl`` and ``movielens`` accept
+``--cache-dir DIR`` to memoize their aggregates (see ``memo``).
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Cold start budget for a command that does not touch pandas.
+STARTUP_TARGET = 0.15
+
+
+def open_cache(args):
+    """``memo.ResultCache`` for ``--cache-dir``, or None when not given."""
+    if not args.cache_dir:
+        return None
+    import memo
+    return memo.ResultCache(args.cache_dir,
+                            max_disk=int(args.cache_size * 2 ** 20))
+
+
+def report_cache(cache):
+    if cache is not None:
+        sys.stderr.write('cache: %s\n' % cache.format_stats())
+
+
+def cmd_etl(args):
+    import etl
+    cache = open_cache(args)
+    edu, pivedu = etl.run(args.csv, since=args.since, cache=cache)
+    if args.output:
+        pivedu.to_csv(args.output)
+    print(etl.mean_by_geo(edu, cache=cache).head(args.head))
+    print(etl.total_ranking(pivedu).head(args.head))
+    report_cache(cache)
+
+
+def cmd_movielens(args):
+    import movielens
+    cache = open_cache(args)
+    data = movielens.load(args.dir)[3]
+    if args.task == 'top':
+        print(movielens.top_movies(data, args.user, n=args.n))
+    else:
+        print(movielens.popular_movies(data, args.min_ratings,
+                                       cache=cache).head(args.n))
+    report_cache(cache)
+
+
+def cmd_plot(args):
+    import etl
+    import plotting
+    pivedu = etl.run(args.csv)[1]
+    if args.kind == 'total':
+        written = plotting.plot_total_by_country(pivedu, args.output)
+    else:
+        written = plotting.plot_value_by_year(pivedu, args.output)
+    if written:
+        print('plot written to %s' % os.path.abspath(written))
+
+
+def cmd_load(args):
+    import loaders
+    result = loaders.load_all(args.dir, args.csv, executor=args.executor)
+    print(loaders.format_timings(result.timings))
+
+
+def _parse_value(dim, text):
+    """``text`` as the type of the labels of ``dim`` (zip codes are strings)."""
+    import cube
+    labels = cube.DIMENSIONS.get(dim)
+    if labels and isinstance(labels[0], int) and text.lstrip('-').isdigit():
+        return int(text)
+    return text
+
+
+def cmd_cube(args):
+    import cube
+    if not args.cube.endswith('.npz'):
+        args.cube += '.npz'             # np.savez adds it when writing
+    if args.action in ('build', 'update'):
+        import movielens
+        users, ratings, movies, _ = movielens.load(args.dir)
+        if args.action == 'update' and os.path.exists(args.cube):
+            ratings_cube = cube.RatingsCube.load(args.cube)
+            added = ratings_cube.update(ratings, users, movies)
+        else:
+            ratings_cube = cube.RatingsCube(args.dims)
+            added = ratings_cube.add(ratings, users, movies)
+        ratings_cube.save(args.cube)
+        print('%d ratings added, cube %s over %s' % (
+            added, 'x'.join(map(str, ratings_cube.shape)),
+            ', '.join(ratings_cube.dims)))
+        return
+    start = time.perf_counter()
+    result = cube.RatingsCube.load(args.cube)
+    for condition in args.where:
+        dim, _, values = condition.partition('=')
+        values = [_parse_value(dim, v) for v in values.split(',')]
+        if len(values) == 1:
+            result = result.slice(**{dim: values[0]})
+        else:
+            result = result.dice(**{dim: values})
+    result = result.rollup(*args.by)
+    elapsed = time.perf_counter() - start
+    print(result.to_series(args.stat).to_string())
+    sys.stderr.write('answered in %.1f ms\n' % (elapsed * 1000))
+
+
+def cmd_partitions(args):
+    import partitions
+    if args.action in ('build', 'append'):
+        import movielens
+        ratings = movielens.load(args.dir)[1]
+        mode = 'replace' if args.action == 'build' else 'append'
+        before = 0 if mode == 'replace' else sum(
+            p['rows'] for p in partitions.read_manifest(args.root)['partitions'])
+        manifest = partitions.write_partitions(ratings, args.root, mode=mode)
+        rows = sum(p['rows'] for p in manifest['partitions'])
+        print('%d rows added, %d rows in %d month partitions in %s' % (
+            rows - before, rows, len(manifest['partitions']), args.root))
+        return
+    store = partitions.PartitionedRatings(args.root)
+    if args.action == 'report':
+        for label, stats, seconds in partitions.typical_windows(store):
+            print('%-13s %s, %.3f s' % (label, partitions.format_scan(stats),
+                                        seconds))
+        return
+    start, end = store.last_days(args.last_days)
+    if args.action == 'per-day':
+        print(store.ratings_per_day(start, end).to_string())
+    else:
+        print(store.rolling_mean_per_movie(start, end, args.window).to_string())
+    sys.stderr.write(partitions.format_scan(store.last_scan) + '\n')
+
+
+def cmd_sqlload(args):
+    import etl
+    import movielens
+    import sqlload
+    edu, pivedu = etl.run(args.csv)
+    data = movielens.load(args.dir)[3]
+    pragmas = None
+    if args.pragma:
+        pragmas = dict(sqlload.BULK_PRAGMAS)
+        pragmas.update(p.split('=', 1) for p in args.pragma)
+    reports = sqlload.load_toolbox(
+        args.db, edu, pivedu, data, batch_size=args.batch_size,
+        transaction_rows=args.transaction_rows, upsert=args.upsert,
+        pragmas=pragmas)
+    for report in reports:
+        print(sqlload.format_report(report))
+
+
+def cmd_serve(args):
+    import service
+    service.run(args.dir, args.host, args.port, window=args.window_ms / 1000.0,
+                max_batch=args.max_batch, cache_size=args.cache_users)
+
+
+def measure_startup(runs=5, argv=('--help',)):
+    """Best wall time of ``runs`` fresh interpreters running this script."""
+    command = [sys.executable, os.path.abspath(__file__)] + list(argv)
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call(command, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def heavy_imports(modules=('pandas', 'matplotlib')):
+    """Which of ``modules`` a fresh interpreter has loaded after ``import cli``."""
+    code = ('import sys, cli; print(" ".join(m for m in %r if m in sys.modules))'
+            % (modules,))
+    out = subprocess.check_output([sys.executable, '-c', code],
+                                  cwd=os.path.dirname(os.path.abspath(__file__)))
+    return out.decode().split()
+
+
+def cmd_startup(args):
+    elapsed = measure_startup(args.runs)
+    status = 'ok' if elapsed <= args.target else 'SLOW'
+    print('cold start %.3f s (target %.3f s) %s' % (elapsed, args.target, status))
+    heavy = heavy_imports()
+    if heavy:
+        print('heavy modules imported at start-up: %s' % ', '.join(heavy))
+    return 0 if elapsed <= args.target and not heavy else 1
+
+
+def add_cache_arguments(parser):
+    parser.add_argument('--cache-dir',
+                        help='memoize aggregates in this directory')
+    parser.add_argument('--cache-size', type=float, default=512,
+                        help='size bound of the cache directory in MiB')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description='Toolbox for Data Scientists: ETL, MovieLens and plots.')
+    sub = parser.add_subparsers(dest='command')
+    sub.required = True
+
+    p = sub.add_parser('etl', help='Eurostat ETL: mean by country, ranking')
+    p.add_argument('--csv', default='educ_figdp/educ_figdp_1_Data.csv')
+    p.add_argument('--since', type=int, default=2005)
+    p.add_argument('--head', type=int, default=5)
+    p.add_argument('--output', help='write the cleaned pivot to this CSV')
+    add_cache_arguments(p)
+    p.set_defaults(func=cmd_etl)
+
+    p = sub.add_parser('movielens', help='MovieLens 1M analysis')
+    p.add_argument('--dir', default='ml-1m')
+    add_cache_arguments(p)
+    tasks = p.add_subparsers(dest='task')
+    tasks.required = True
+    top = tasks.add_parser('top', help='highest rated titles of a user')
+    top.add_argument('user', type=int)
+    top.add_argument('--n', type=int, default=10)
+    popular = tasks.add_parser('popular', help='best titles with many ratings')
+    popular.add_argument('--min-ratings', type=int, default=250)
+    popular.add_argument('--n', type=int, default=10)
+    p.set_defaults(func=cmd_movielens)
+
+    p = sub.add_parser('plot', help='plots of the Eurostat pivot')
+    p.add_argument('kind', choices=['total', 'by-year'])
+    p.add_argument('--csv', default='educ_figdp/educ_figdp_1_Data.csv')
+    p.add_argument('--output', help='image file (if omitted: shown on screen, '
+                   'or written to a default file name without a display)')
+    p.set_defaults(func=cmd_plot)
+
+    p = sub.add_parser('load', help='load every source and report timings')
+    p.add_argument('--dir', default='ml-1m')
+    p.add_argument('--csv', default='educ_figdp/educ_figdp_1_Data.csv')
+    p.add_argument('--executor', choices=['thread', 'process'],
+                   default='thread')
+    p.set_defaults(func=cmd_load)
+
+    p = sub.add_parser('cube', help='ratings cube by demographics and genre')
+    p.add_argument('action', choices=['build', 'update', 'query'])
+    p.add_argument('--cube', default='ratings_cube.npz')
+    p.add_argument('--dir', default='ml-1m')
+    p.add_argument('--dims', nargs='+',
+                   default=['gender', 'age', 'occupation', 'genre'],
+                   help='dimensions of a new cube (build)')
+    p.add_argument('--by', nargs='*', default=[],
+                   help='dimensions kept in the answer (query)')
+    p.add_argument('--where', nargs='*', default=[], metavar='DIM=V[,V...]',
+                   help='slice on one value or dice on several (query)')
+    p.add_argument('--stat', default='mean',
+                   choices=['count', 'sum', 'sumsq', 'mean', 'std'])
+    p.set_defaults(func=cmd_cube)
+
+    p = sub.add_parser('partitions', help='month-partitioned ratings')
+    p.add_argument('action',
+                   choices=['build', 'append', 'per-day', 'rolling', 'report'],
+                   help='build rewrites the partitions, append adds the '
+                        'ratings not stored yet')
+    p.add_argument('--root', default='ratings_by_month')
+    p.add_argument('--dir', default='ml-1m')
+    p.add_argument('--last-days', type=int, default=30)
+    p.add_argument('--window', type=int, default=7,
+                   help='rolling window in days')
+    p.set_defaults(func=cmd_partitions)
+
+    p = sub.add_parser('sqlload', help='bulk load the tables into SQLite')
+    p.add_argument('--db', default='toolbox.sqlite')
+    p.add_argument('--csv', default='educ_figdp/educ_figdp_1_Data.csv')
+    p.add_argument('--dir', default='ml-1m')
+    p.add_argument('--batch-size', type=int, default=50000)
+    p.add_argument('--transaction-rows', type=int,
+                   help='commit every N rows (default: one transaction)')
+    p.add_argument('--upsert', action='store_true',
+                   help='update rows with an existing key instead of '
+                        'recreating the tables')
+    p.add_argument('--pragma', action='append', metavar='NAME=VALUE',
+                   help='override one of the bulk-load pragmas')
+    p.set_defaults(func=cmd_sqlload)
+
+    p = sub.add_parser('serve', help='HTTP service for top_movies lookups')
+    p.add_argument('--dir', default='ml-1m')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8000)
+    p.add_argument('--window-ms', type=float, default=2,
+                   help='requests arriving within this window are batched')
+    p.add_argument('--max-batch', type=int, default=512)
+    p.add_argument('--cache-users', type=int, default=4096,
+                   help='answers kept in the hot-user cache')
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser('startup', help='measure the cold start of this CLI')
+    p.add_argument('--runs', type=int, default=5)
+    p.add_argument('--target', type=float, default=STARTUP_TARGET)
+    p.set_defaults(func=cmd_startup)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+# coding: utf-8
+"""Precomputed OLAP cube of the MovieLens ratings.
+
+The demographics of ``users.dat`` (gender, the 7 age buckets, the 21
+occupations, first digit of the zip code) and the 18 genres of
+``movies.dat`` are small categorical dimensions.  ``RatingsCube`` runs one
+vectorized pass over the ratings and accumulates dense ``count``, ``sum``
+and ``sumsq`` arrays over the chosen dimensions; roll-up, slice and dice are
+then array reductions and indexing on those arrays, answered without going
+back to the ratings.
+
+A movie usually has several genres, so with ``genre`` as a dimension a
+rating is counted once in each of its genres.  Rolling the genre dimension
+up therefore counts multi-genre ratings several times; build a cube without
+``genre`` for exact totals.
+
+The cube is saved as a ``.npz`` file together with the sorted
+``(user_id, movie_id)`` keys of the ratings it contains, and ``update`` only
+adds ratings whose key is not there yet, whatever their timestamp (MovieLens
+has at most one rating per user and movie).
+"""
+
+import json
+from collections import OrderedDict
+
+import numpy as np
+
+GENRES = ['Action', 'Adventure', 'Animation', "Children's", 'Comedy', 'Crime',
+          'Documentary', 'Drama', 'Fantasy', 'Film-Noir', 'Horror', 'Musical',
+          'Mystery', 'Romance', 'Sci-Fi', 'Thriller', 'War', 'Western']
+
+# Dimension name -> ordered list of its values.
+DIMENSIONS = OrderedDict([
+    ('gender', ['F', 'M']),
+    ('age', [1, 18, 25, 35, 45, 50, 56]),
+    ('occupation', list(range(21))),
+    ('zip', list('0123456789') + ['other']),
+    ('genre', GENRES),
+])
+
+USER_DIMENSIONS = ('gender', 'age', 'occupation', 'zip')
+
+STATS = ('count', 'sum', 'sumsq')
+
+
+def rating_keys(ratings):
+    """One ``int64`` key per rating, combining ``user_id`` and ``movie_id``."""
+    return (ratings['user_id'].to_numpy().astype(np.int64) << 32) | \
+        ratings['movie_id'].to_numpy().astype(np.int64)
+
+
+def _codes(values, labels, dimension):
+    """Position of every value in ``labels``; unknown values are an error."""
+    lookup = dict((label, code) for code, label in enumerate(labels))
+    try:
+        return np.array([lookup[v] for v in values], dtype=np.intp)
+    except KeyError as exc:
+        raise ValueError('unknown %s value %r' % (dimension, exc.args[0]))
+
+
+def _user_codes(users, dimension):
+    if dimension == 'zip':
+        first = users['zip'].astype(str).str[0]
+        values = first.where(first.str.isdigit(), 'other')
+    else:
+        values = users[dimension]
+    return _codes(values.tolist(), DIMENSIONS[dimension], dimension)
+
+
+def _by_id(ids, codes):
+    """Dense array indexed by id (``-1`` for ids not present)."""
+    ids = np.asarray(ids)
+    table = np.full(ids.max() + 1, -1, dtype=np.intp)
+    table[ids] = codes
+    return table
+
+
+def genre_matrix(movies):
+    """Boolean ``(max movie_id + 1, 18)`` matrix of the genres of each movie."""
+    ids = movies['movie_id'].to_numpy()
+    matrix = np.zeros((ids.max() + 1, len(GENRES)), dtype=bool)
+    lookup = dict((g, i) for i, g in enumerate(GENRES))
+    for movie_id, genres in zip(ids, movies['genres']):
+        for genre in genres.split('|'):
+            if genre not in lookup:
+                raise ValueError('unknown genre %r' % genre)
+            matrix[movie_id, lookup[genre]] = True
+    return matrix
+
+
+class RatingsCube(object):
+    """Dense count/sum/sumsq arrays over categorical rating dimensions."""
+
+    def __init__(self, dims=('gender', 'age', 'occupation', 'genre'),
+                 arrays=None, ingested=None, values=None, derived=False):
+        dims = tuple(dims)
+        unknown = [d for d in dims if d not in DIMENSIONS]
+        if unknown:
+            raise ValueError('unknown dimension(s) %r, choose from %r'
+                             % (unknown, list(DIMENSIONS)))
+        self.dims = dims
+        # Values along each axis; a diced cube keeps only some of them.
+        self.values = dict((d, list((values or {}).get(d, DIMENSIONS[d])))
+                           for d in dims)
+        self.shape = tuple(len(self.values[d]) for d in dims)
+        if arrays is None:
+            arrays = dict((s, np.zeros(self.shape, dtype=np.float64))
+                          for s in STATS)
+        self.count = arrays['count']
+        self.sum = arrays['sum']
+        self.sumsq = arrays['sumsq']
+        # Sorted keys (see rating_keys) of the ratings already added.
+        self.ingested = np.empty(0, dtype=np.int64) if ingested is None \
+            else ingested
+        # Rolled-up, sliced or diced cubes cannot take new ratings.
+        self.derived = derived
+
+    # -- building -----------------------------------------------------------
+
+    def add(self, ratings, users, movies):
+        """Accumulate ``ratings`` (one vectorized pass); returns rows added."""
+        if self.derived:
+            raise ValueError('cannot add ratings to a rolled-up, sliced or '
+                             'diced cube')
+        if not len(ratings):
+            return 0
+        user_ids = ratings['user_id'].to_numpy()
+        movie_ids = ratings['movie_id'].to_numpy()
+        rating = ratings['rating'].to_numpy(dtype=np.float64)
+
+        codes = []
+        for dim in self.dims:
+            if dim in USER_DIMENSIONS:
+                table = _by_id(users['user_id'], _user_codes(users, dim))
+                if user_ids.max() >= len(table) or (table[user_ids] < 0).any():
+                    raise ValueError('ratings refer to users not in users')
+                codes.append(table[user_ids])
+            else:
+                codes.append(None)      # genre, expanded below
+
+        if 'genre' in self.dims:
+            matrix = genre_matrix(movies)
+            if movie_ids.max() >= len(matrix):
+                raise ValueError('ratings refer to movies not in movies')
+            # One (rating, genre) pair per genre of the rated movie.
+            rows, genres = np.nonzero(matrix[movie_ids])
+            codes = [genres if c is None else c[rows] for c in codes]
+            rating = rating[rows]
+
+        size = int(np.prod(self.shape))
+        flat = np.ravel_multi_index(codes, self.shape) if codes else \
+            np.zeros(len(rating), dtype=np.intp)
+        self.count += np.bincount(flat, minlength=size).reshape(self.shape)
+        self.sum += np.bincount(flat, rating, size).reshape(self.shape)
+        self.sumsq += np.bincount(flat, rating * rating,
+                                  size).reshape(self.shape)
+        self.ingested = np.union1d(self.ingested, rating_keys(ratings))
+        return len(ratings)
+
+    def update(self, ratings, users, movies):
+        """Add only the ratings not added before; returns rows added."""
+        new = ~np.isin(rating_keys(ratings), self.ingested)
+        return self.add(ratings[new], users, movies)
+
+    @classmethod
+    def build(cls, ratings, users, movies, dims=None):
+        cube = cls(dims) if dims is not None else cls()
+        cube.add(ratings, users, movies)
+        return cube
+
+    # -- queries ------------------------------------------------------------
+
+    def _derive(self, dims, transform, values=None):
+        arrays = dict((s, transform(getattr(self, s))) for s in STATS)
+        merged = dict(self.values)
+        merged.update(values or {})
+        return RatingsCube(dims, arrays, values=merged, derived=True)
+
+    def rollup(self, *keep):
+        """Cube over ``keep`` only (in that order), the others summed out."""
+        self._check(keep)
+        axes = tuple(i for i, d in enumerate(self.dims) if d not in keep)
+        remaining = [d for d in self.dims if d in keep]
+        order = [remaining.index(d) for d in keep]
+        return self._derive(keep, lambda a: a.sum(axis=axes).transpose(order))
+
+    def slice(self, **fixed):
+        """Fix one value per named dimension; those dimensions disappear."""
+        self._check(fixed)
+        index = tuple(self._position(d, fixed[d]) if d in fixed
+                      else slice(None) for d in self.dims)
+        return self._derive([d for d in self.dims if d not in fixed],
+                            lambda a: a[index])
+
+    def dice(self, **subsets):
+        """Keep only the listed values of the named dimensions."""
+        self._check(subsets)
+        cube = self
+        for axis, dim in enumerate(self.dims):
+            if dim in subsets:
+                positions = [self._position(dim, v) for v in subsets[dim]]
+                index = (slice(None),) * axis + (positions,)
+                cube = cube._derive(cube.dims, lambda a, i=index: a[i],
+                                    {dim: list(subsets[dim])})
+        return cube
+
+    def mean(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sum / self.count
+
+    def std(self):
+        """Population standard deviation of the ratings in each cell."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.sum / self.count
+            return np.sqrt(np.maximum(self.sumsq / self.count - mean ** 2, 0))
+
+    def to_series(self, stat='mean'):
+        """``stat`` (count, sum, sumsq, mean or std) as a pandas Series."""
+        import pandas as pd
+        values = getattr(self, stat)
+        values = values() if callable(values) else values
+        if not self.dims:
+            return pd.Series([float(values)], name=stat)
+        index = pd.MultiIndex.from_product([self.values[d] for d in self.dims],
+                                           names=list(self.dims))
+        return pd.Series(np.ravel(values), index=index, name=stat)
+
+    def _check(self, names):
+        unknown = [d for d in names if d not in self.dims]
+        if unknown:
+            raise ValueError('dimension(s) %r not in cube %r'
+                             % (unknown, self.dims))
+
+    def _position(self, dim, value):
+        try:
+            return self.values[dim].index(value)
+        except ValueError:
+            raise ValueError('%r is not a value of %s' % (value, dim))
+
+    # -- persistence --------------------------------------------------------
+
+    def save(self, path):
+        """Write ``path`` (numpy adds ``.npz`` when it is missing)."""
+        meta = json.dumps({'dims': list(self.dims), 'values': self.values,
+                           'derived': self.derived})
+        np.savez(path, meta=np.array(meta), count=self.count, sum=self.sum,
+                 sumsq=self.sumsq, ingested=self.ingested)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as archive:
+            meta = json.loads(str(archive['meta']))
+            arrays = dict((s, archive[s]) for s in STATS)
+            ingested = archive['ingested']
+        return cls(meta['dims'], arrays, ingested, meta['values'],
+                   meta['derived'])
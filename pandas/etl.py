@@ -0,0 +1,83 @@
+# coding: utf-8
+"""Eurostat education expenditure ETL from the Toolbox notebook.
+
+The functions follow the order of the "Open government data analysis"
+section: read the extract, handle missing values, aggregate by country and
+pivot by year, clean the pivot and rank the countries.  pandas is imported
+inside the functions so that importing this module stays cheap.
+"""
+
+EUROSTAT_PATH = 'educ_figdp/educ_figdp_1_Data.csv'
+
+# Aggregates that are not countries and would dominate any ranking.
+AGGREGATE_ROWS = [
+    'Euro area (13 countries)',
+    'Euro area (15 countries)',
+    'Euro area (17 countries)',
+    'Euro area (18 countries)',
+    'European Union (25 countries)',
+    'European Union (27 countries)',
+    'European Union (28 countries)',
+]
+
+RENAMES = {'Germany (until 1990 former territory of the FRG)': 'Germany'}
+
+
+def read_education(path=EUROSTAT_PATH):
+    """Read the extract keeping only ``TIME``, ``GEO`` and ``Value``."""
+    from loaders import read_eurostat
+    return read_eurostat(path)
+
+
+def drop_missing(edu, column='Value'):
+    """Rows of ``edu`` where ``column`` is not null."""
+    return edu.dropna(how='any', subset=[column], axis=0)
+
+
+def fill_missing(edu, column='Value', value=0):
+    """Copy of ``edu`` with the nulls of ``column`` replaced by ``value``."""
+    return edu.fillna(value={column: value})
+
+
+def mean_by_geo(edu, cache=None):
+    """Mean ``Value`` per country, highest first.
+
+    With a ``memo.ResultCache`` as ``cache`` the result is memoized on the
+    content of the ``GEO`` and ``Value`` columns.
+    """
+    if cache is not None:
+        return cache.call('etl.mean_by_geo', edu, ['GEO', 'Value'],
+                          mean_by_geo, source='edu')
+    group = edu[['GEO', 'Value']].groupby('GEO').mean()
+    return group.sort_values(by='Value', ascending=False)
+
+
+def pivot_by_year(edu, since=2005, cache=None):
+    """Countries as rows and years after ``since`` as columns."""
+    if cache is not None:
+        return cache.call('etl.pivot_by_year', edu, ['TIME', 'GEO', 'Value'],
+                          pivot_by_year, source='edu', since=since)
+    import pandas as pd
+    filtered_data = edu[edu['TIME'] > since]
+    return pd.pivot_table(filtered_data, values='Value', index=['GEO'],
+                          columns=['TIME'])
+
+
+def clean_pivot(pivedu):
+    """Drop the EU/Euro area aggregates, shorten Germany and drop nulls."""
+    pivedu = pivedu.drop(AGGREGATE_ROWS, axis=0, errors='ignore')
+    pivedu = pivedu.rename(index=RENAMES)
+    return pivedu.dropna()
+
+
+def total_ranking(pivedu):
+    """Dense rank of the countries by the sum over all years."""
+    totalSum = pivedu.sum(axis=1)
+    return totalSum.rank(ascending=False, method='dense').sort_values()
+
+
+def run(path=EUROSTAT_PATH, since=2005, cache=None):
+    """Whole ETL: returns ``(edu, pivedu)`` with ``pivedu`` already cleaned."""
+    edu = read_education(path)
+    pivedu = clean_pivot(pivot_by_year(edu, since=since, cache=cache))
+    return edu, pivedu
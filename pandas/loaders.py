@@ -0,0 +1,226 @@
+# coding: utf-8
+"""Concurrent loading of the data sources used in the Toolbox notebook.
+
+Each input file is declared as a ``Source`` and every derived table (for
+example the MovieLens merge) as a ``Join`` over named inputs.  Sources are
+read concurrently in a thread or process pool, joins are started as soon as
+all of their inputs are available, and the time spent on every step is
+recorded.  Results are always returned in declaration order, whatever order
+the pool finished them in.
+"""
+
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+
+Source = namedtuple('Source', ['name', 'reader', 'path', 'kwargs'])
+Source.__new__.__defaults__ = ({},)
+
+Join = namedtuple('Join', ['name', 'func', 'inputs'])
+
+LoadResult = namedtuple('LoadResult', ['frames', 'timings'])
+
+EXECUTORS = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
+
+MOVIELENS_NAMES = {
+    'users': ['user_id', 'gender', 'age', 'occupation', 'zip'],
+    'ratings': ['user_id', 'movie_id', 'rating', 'timestamp'],
+    'movies': ['movie_id', 'title', 'genres'],
+}
+
+
+class SourceError(Exception):
+    """A single source or join failed; keeps the name and path of the step."""
+
+    def __init__(self, name, path, cause):
+        self.name = name
+        self.path = path
+        self.cause = cause
+        where = ' (%s)' % path if path else ''
+        Exception.__init__(self, '%s%s: %s: %s' % (
+            name, where, type(cause).__name__, cause))
+
+
+class LoadError(Exception):
+    """One or more steps failed; ``errors`` maps step name to SourceError."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        Exception.__init__(self, 'failed to load %d source(s):\n  %s' % (
+            len(errors), '\n  '.join(str(e) for e in errors.values())))
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    value = func(*args, **kwargs)
+    return value, time.perf_counter() - start
+
+
+def _import_pandas():
+    # Pool initializer: pay the pandas import once per worker, outside the
+    # timed readers.
+    import pandas  # noqa: F401
+
+
+def read_delimited(path, names, dtype=None, **kwargs):
+    """Read a ``::`` separated MovieLens file without ``:`` inside fields.
+
+    ``users.dat`` and ``ratings.dat`` only hold numbers and codes, so they
+    are parsed by the C parser splitting on ``:`` and keeping every other
+    (non-empty) column.  The C parser releases the GIL while tokenizing,
+    which is what lets the thread pool overlap the reads.  ``dtype`` maps
+    column names to types, as in ``read_csv``.
+    """
+    import pandas as pd
+    kwargs.setdefault('encoding', 'latin-1')
+    if dtype:
+        kwargs['dtype'] = dict((2 * names.index(c), t) for c, t in dtype.items())
+    return pd.read_csv(path, sep=':', header=None, engine='c',
+                       usecols=list(range(0, 2 * len(names), 2)),
+                       names=list(range(2 * len(names) - 1)),
+                       **kwargs).set_axis(names, axis=1)
+
+
+def read_movies(path, names=('movie_id', 'title', 'genres'), **kwargs):
+    """Read ``movies.dat``, whose titles may contain ``:`` (never ``::``).
+
+    Whole lines are read by the C parser and split on ``::`` afterwards,
+    the genres being the last field and the id the first.
+    """
+    import csv
+    import pandas as pd
+    kwargs.setdefault('encoding', 'latin-1')
+    lines = pd.read_csv(path, sep='\x01', header=None, names=['line'],
+                        engine='c', quoting=csv.QUOTE_NONE,
+                        **kwargs)['line']
+    head = lines.str.split('::', n=1, expand=True)
+    tail = head[1].str.rsplit('::', n=1, expand=True)
+    return pd.DataFrame({names[0]: head[0].astype('int64'),
+                         names[1]: tail[0], names[2]: tail[1]})
+
+
+def read_eurostat(path, **kwargs):
+    """Read the Eurostat expenditure extract used in the ETL section."""
+    import pandas as pd
+    kwargs.setdefault('na_values', ':')
+    kwargs.setdefault('usecols', ['TIME', 'GEO', 'Value'])
+    return pd.read_csv(path, **kwargs)
+
+
+def merge_movielens(ratings, users, movies):
+    """The ``pd.merge(pd.merge(ratings, users), movies)`` step of the notebook."""
+    import pandas as pd
+    return pd.merge(pd.merge(ratings, users), movies)
+
+
+def load_sources(sources, joins=(), executor='thread', max_workers=None):
+    """Read ``sources`` concurrently and run ``joins`` once their inputs exist.
+
+    ``executor`` is ``'thread'`` (default; useful when the readers release
+    the GIL, as pandas' C parser does) or ``'process'`` (readers must be
+    picklable, joins then run in the calling process so the frames are not
+    shipped back and forth).  pandas is imported before any reader starts,
+    so the timings measure the reads only.
+
+    Returns a ``LoadResult`` whose ``frames`` and ``timings`` are ordered
+    dicts following the declaration order of sources and then joins.  If any
+    step fails, a ``LoadError`` is raised after the remaining independent
+    steps have finished; joins depending on a failed step are not run.
+    """
+    sources = list(sources)
+    joins = list(joins)
+    names = [s.name for s in sources] + [j.name for j in joins]
+    if len(set(names)) != len(names):
+        raise ValueError('duplicate source/join names: %r' % names)
+    for join in joins:
+        missing = [i for i in join.inputs if i not in names]
+        if missing:
+            raise ValueError('join %r depends on unknown input(s) %r'
+                             % (join.name, missing))
+    available = set(s.name for s in sources)
+    unresolved = list(joins)
+    while unresolved:
+        ready = [j for j in unresolved if set(j.inputs) <= available]
+        if not ready:
+            raise ValueError('joins %r form a cycle or depend on one'
+                             % [j.name for j in unresolved])
+        available.update(j.name for j in ready)
+        unresolved = [j for j in unresolved if j not in ready]
+    if executor not in EXECUTORS:
+        raise ValueError('executor must be one of %r' % sorted(EXECUTORS))
+
+    frames, timings, errors = {}, {}, OrderedDict()
+    pending_joins = list(joins)
+    paths = dict((s.name, s.path) for s in sources)
+    running = {}
+
+    _import_pandas()
+    with EXECUTORS[executor](max_workers=max_workers,
+                             initializer=_import_pandas) as pool:
+        for source in sources:
+            future = pool.submit(_timed, source.reader, source.path,
+                                 **source.kwargs)
+            running[future] = source.name
+
+        def start_ready_joins():
+            for join in list(pending_joins):
+                if any(i in errors for i in join.inputs):
+                    pending_joins.remove(join)
+                    errors[join.name] = SourceError(
+                        join.name, None, RuntimeError('skipped, input failed'))
+                elif all(i in frames for i in join.inputs):
+                    pending_joins.remove(join)
+                    args = [frames[i] for i in join.inputs]
+                    if executor == 'process':
+                        try:
+                            frames[join.name], timings[join.name] = _timed(
+                                join.func, *args)
+                        except Exception as exc:
+                            errors[join.name] = SourceError(join.name, None, exc)
+                        start_ready_joins()
+                        return
+                    running[pool.submit(_timed, join.func, *args)] = join.name
+
+        start_ready_joins()
+        while running:
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    frames[name], timings[name] = future.result()
+                except Exception as exc:
+                    errors[name] = SourceError(name, paths.get(name), exc)
+            start_ready_joins()
+
+    if errors:
+        raise LoadError(OrderedDict((n, errors[n]) for n in names if n in errors))
+    return LoadResult(OrderedDict((n, frames[n]) for n in names),
+                      OrderedDict((n, timings[n]) for n in names))
+
+
+def movielens_sources(directory='ml-1m'):
+    """Sources for the three MovieLens 1M files in ``directory``."""
+    readers = {'users': read_delimited, 'ratings': read_delimited,
+               'movies': read_movies}
+    kwargs = {'users': {'dtype': {'zip': str}}}   # keep leading zeros
+    return [Source(name, readers[name], '%s/%s.dat' % (directory, name),
+                   dict(kwargs.get(name, {}), names=MOVIELENS_NAMES[name]))
+            for name in ('users', 'ratings', 'movies')]
+
+
+def load_all(movielens_dir='ml-1m',
+             eurostat_path='educ_figdp/educ_figdp_1_Data.csv',
+             executor='thread', max_workers=None):
+    """Load MovieLens and Eurostat together; ``data`` is the merged table."""
+    sources = movielens_sources(movielens_dir)
+    sources.append(Source('edu', read_eurostat, eurostat_path))
+    joins = [Join('data', merge_movielens, ('ratings', 'users', 'movies'))]
+    return load_sources(sources, joins, executor=executor,
+                        max_workers=max_workers)
+
+
+def format_timings(timings):
+    """One line per step, e.g. ``ratings       1.234 s``."""
+    return '\n'.join('%-12s %7.3f s' % (name, seconds)
+                     for name, seconds in timings.items())
@@ -0,0 +1,106 @@
+# coding: utf-8
+"""Load test of the query service (``service.py``) on localhost.
+
+    python loadtest.py [--port 8000] [--concurrency 64] [--duration 10]
+                       [--users 6040] [--hot 0.2]
+
+Opens ``concurrency`` keep-alive connections, each sending
+``/top_movies`` requests back to back (a ``--movie-share`` of them are
+``/movie`` lookups instead) for ``--duration`` seconds.  A ``--hot``
+fraction of the requests goes to a small set of 100 users, as dashboards do.
+Prints the client-side throughput and latency percentiles, then the
+server's own ``/stats``.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+
+async def request(reader, writer, target):
+    writer.write(('GET %s HTTP/1.1\r\nHost: localhost\r\n\r\n'
+                  % target).encode('latin-1'))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def client(args, deadline, latencies, statuses, seed):
+    rng = random.Random(seed)
+    hot_users = list(range(1, 101))
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    try:
+        while time.perf_counter() < deadline:
+            if rng.random() < args.movie_share:
+                target = '/movie?id=%d' % rng.randint(1, args.movies)
+            else:
+                user = rng.choice(hot_users) if rng.random() < args.hot \
+                    else rng.randint(1, args.users)
+                target = '/top_movies?user=%d&n=%d' % (user, args.n)
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, target)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float('nan')
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+async def main_async(args):
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*[client(args, deadline, latencies, statuses, i)
+                           for i in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print('%d requests in %.1f s: %.0f req/s, statuses %s' % (
+        len(latencies), elapsed, len(latencies) / elapsed,
+        json.dumps(statuses, sort_keys=True)))
+    print('client latency ms: ' + ', '.join(
+        'p%s %.2f' % (p, percentile(latencies, p) * 1000)
+        for p in (50, 90, 99, 99.9)))
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, body = await request(reader, writer, '/stats')
+    writer.close()
+    print('server stats: %s' % body.decode('utf-8'))
+    return percentile(latencies, 99)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--users', type=int, default=6040)
+    parser.add_argument('--movies', type=int, default=3952)
+    parser.add_argument('--n', type=int, default=10)
+    parser.add_argument('--hot', type=float, default=0.2)
+    parser.add_argument('--movie-share', type=float, default=0.2)
+    parser.add_argument('--p99-target', type=float, default=50,
+                        help='exit with 1 when the client p99 (ms) is above')
+    args = parser.parse_args(argv)
+    p99 = asyncio.run(main_async(args))
+    return 0 if p99 * 1000 <= args.p99_target else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
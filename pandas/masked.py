@@ -0,0 +1,272 @@
+# coding: utf-8
+"""Copy-free missing-value handling with null bitmaps.
+
+The "Missing values" part of the notebook copies the whole frame at each
+step: ``dropna`` and ``fillna`` return new frames and ``isnull`` a new
+boolean column.  Here a column keeps its values array untouched and tracks
+the nulls in a bitmap (one bit per row):
+
+* ``isnull()`` returns the ``NullBitmap`` itself,
+* ``dropna()`` returns a ``Selection``, a view that only refers to the
+  column and its bitmap,
+* ``fillna(value)`` returns a column sharing the same values and bitmap;
+  the fill value is applied when values are read.
+
+Data is copied only by ``materialize()`` / ``to_frame()``, and every copy is
+added to ``copies.bytes_copied`` so the savings can be measured.
+Reductions (``count``, ``sum``, ``mean``, ``min``, ``max``) work directly on
+the shared values; they only unpack the bitmap into a temporary one byte per
+row mask, which is not counted as a copy of the data.
+"""
+
+import numpy as np
+
+
+class CopyCounter(object):
+    """Bytes of column data copied by this module."""
+
+    def __init__(self):
+        self.bytes_copied = 0
+
+    def add(self, array):
+        self.bytes_copied += array.nbytes
+        return array
+
+    def reset(self):
+        self.bytes_copied = 0
+
+
+copies = CopyCounter()
+
+
+class NullBitmap(object):
+    """One bit per row, set where the row is null."""
+
+    def __init__(self, bits, length):
+        self.bits = bits
+        self.length = length
+
+    @classmethod
+    def from_mask(cls, mask):
+        mask = np.asarray(mask, dtype=bool)
+        return cls(np.packbits(mask, bitorder='little'), len(mask))
+
+    def to_mask(self):
+        """Unpacked boolean mask (``True`` where null)."""
+        return np.unpackbits(self.bits, count=self.length,
+                             bitorder='little').view(bool)
+
+    def count(self):
+        """Number of nulls (the padding bits of the last byte are zero)."""
+        return int(np.unpackbits(self.bits).sum())
+
+    def __or__(self, other):
+        if self.length != other.length:
+            raise ValueError('bitmaps of different length')
+        return NullBitmap(self.bits | other.bits, self.length)
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+
+class MaskedColumn(object):
+    """A values array plus a ``NullBitmap``; optionally a lazy fill value."""
+
+    _NO_FILL = object()
+
+    def __init__(self, values, nulls, fill=_NO_FILL, name=None):
+        if len(values) != len(nulls):
+            raise ValueError('values and null bitmap have different length')
+        self.values = values
+        self.nulls = nulls
+        self.fill = fill
+        self.name = name
+
+    @classmethod
+    def from_series(cls, series):
+        """Wrap ``series`` without copying its values when pandas allows it."""
+        values = series.to_numpy(copy=False)
+        return cls(values, NullBitmap.from_mask(series.isnull().to_numpy()),
+                   name=series.name)
+
+    @property
+    def filled(self):
+        return self.fill is not self._NO_FILL
+
+    def isnull(self):
+        """The null bitmap; no nulls are reported once a fill is applied."""
+        if self.filled:
+            return NullBitmap(np.zeros_like(self.nulls.bits), len(self))
+        return self.nulls
+
+    def dropna(self):
+        """``Selection`` of the non-null rows (a view, nothing is copied)."""
+        return Selection(self, self.nulls)
+
+    def fillna(self, value):
+        """Same values and bitmap, with ``value`` read in place of nulls."""
+        return MaskedColumn(self.values, self.nulls, value, self.name)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        row = i + len(self) if i < 0 else i
+        if not 0 <= row < len(self):
+            raise IndexError('row %d out of range for %d rows' % (i, len(self)))
+        if self.nulls.bits[row >> 3] >> (row & 7) & 1:
+            return self.fill if self.filled else None
+        return self.values[row]
+
+    def materialize(self, positions=None):
+        """New array with the fill applied (nulls stay NaN); counted.
+
+        ``positions`` restricts the copy to those rows.
+        """
+        if positions is None:
+            out = copies.add(np.array(self.values, copy=True))
+            nulls = self.nulls.to_mask()
+        else:
+            out = copies.add(self.values[positions])
+            nulls = self.nulls.to_mask()[positions]
+        if self.filled and nulls.any():
+            out[nulls] = self.fill
+        return out
+
+    # -- reductions without copying the values ------------------------------
+    # ``excluded`` is an optional NullBitmap of rows left out (a Selection).
+
+    def _masks(self, excluded):
+        nulls = self.nulls.to_mask()
+        if excluded is None:
+            return ~nulls, int(nulls.sum())
+        kept = ~excluded.to_mask()
+        return kept & ~nulls, int((kept & nulls).sum())
+
+    def count(self, excluded=None):
+        valid, n_null = self._masks(excluded)
+        return int(valid.sum()) + (n_null if self.filled else 0)
+
+    def sum(self, excluded=None):
+        valid, n_null = self._masks(excluded)
+        total = np.add.reduce(self.values, where=valid, initial=0)
+        if self.filled:
+            total = total + self.fill * n_null
+        return total
+
+    def mean(self, excluded=None):
+        n = self.count(excluded)
+        return self.sum(excluded) / n if n else float('nan')
+
+    def _extreme(self, ufunc, excluded):
+        valid, n_null = self._masks(excluded)
+        use_fill = self.filled and n_null > 0
+        if not valid.any():
+            return self.fill if use_fill else float('nan')
+        first = self.values[np.argmax(valid)]
+        result = ufunc.reduce(self.values, where=valid, initial=first)
+        return ufunc(result, self.fill) if use_fill else result
+
+    def min(self, excluded=None):
+        return self._extreme(np.minimum, excluded)
+
+    def max(self, excluded=None):
+        return self._extreme(np.maximum, excluded)
+
+
+class Selection(object):
+    """Rows of a ``MaskedColumn`` whose bit in ``excluded`` is not set.
+
+    Only references the column and the bitmap; row positions are computed on
+    demand and values are copied only by ``materialize()``.
+    """
+
+    def __init__(self, column, excluded):
+        self.column = column
+        self.excluded = excluded
+
+    def positions(self):
+        return np.flatnonzero(~self.excluded.to_mask())
+
+    def __len__(self):
+        return len(self.excluded) - self.excluded.count()
+
+    def count(self):
+        return self.column.count(self.excluded)
+
+    def sum(self):
+        return self.column.sum(self.excluded)
+
+    def mean(self):
+        return self.column.mean(self.excluded)
+
+    def min(self):
+        return self.column.min(self.excluded)
+
+    def max(self):
+        return self.column.max(self.excluded)
+
+    def materialize(self):
+        """Array of the selected values, fill applied; counted."""
+        return self.column.materialize(self.positions())
+
+
+class MaskedFrame(object):
+    """Columns of a DataFrame as ``MaskedColumn`` sharing the frame's data."""
+
+    def __init__(self, columns, index=None, rows=None):
+        self.columns = columns
+        self.index = index
+        self.rows = rows            # NullBitmap of excluded rows, or None
+
+    @classmethod
+    def from_frame(cls, frame, columns=None):
+        columns = list(frame.columns) if columns is None else list(columns)
+        return cls(dict((c, MaskedColumn.from_series(frame[c]))
+                        for c in columns), frame.index)
+
+    def __getitem__(self, name):
+        column = self.columns[name]
+        return column if self.rows is None else Selection(column, self.rows)
+
+    def __len__(self):
+        length = len(self.index)
+        return length if self.rows is None else length - self.rows.count()
+
+    def isnull(self, column):
+        return self.columns[column].isnull()
+
+    def dropna(self, subset=None):
+        """Frame view without the rows that are null in any ``subset`` column."""
+        excluded = self.rows
+        for name in subset or list(self.columns):
+            nulls = self.columns[name].isnull()
+            excluded = nulls if excluded is None else excluded | nulls
+        return MaskedFrame(self.columns, self.index, excluded)
+
+    def fillna(self, value):
+        """Lazy fill; ``value`` is a scalar or a dict column -> value."""
+        columns = dict(self.columns)
+        for name, column in columns.items():
+            if isinstance(value, dict):
+                if name in value:
+                    columns[name] = column.fillna(value[name])
+            else:
+                columns[name] = column.fillna(value)
+        return MaskedFrame(columns, self.index, self.rows)
+
+    def to_frame(self):
+        """Materialize as a pandas DataFrame (the copies are counted)."""
+        import pandas as pd
+        positions = None
+        index = self.index
+        if self.rows is not None:
+            positions = np.flatnonzero(~self.rows.to_mask())
+            index = index[positions]
+        data = dict((name, column.materialize(positions))
+                    for name, column in self.columns.items())
+        return pd.DataFrame(data, index=index, columns=list(self.columns))
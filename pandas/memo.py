@@ -0,0 +1,301 @@
+# coding: utf-8
+"""Content-addressed memoization of expensive aggregates.
+
+A result is stored under a key made of the operation name, its parameters and
+a fingerprint of the input columns it reads, so rerunning
+``groupby('GEO').mean()`` or a ``pivot_table`` on an unchanged extract is a
+lookup.  Results live in memory and, optionally, in a directory on disk; both
+tiers are bounded in bytes and evict the least recently used entries first.
+
+The input columns are hashed on every call, so a frame changed in place is
+seen as a new input.  A caller running several aggregates over a frame it
+no longer changes can pass the same ``FrameDigests`` to each call: every
+column is then hashed once and later hits cost a dictionary lookup.
+
+Because the key includes the content of the inputs, a changed input can never
+return a stale result: it misses, and the entries of the old content age out
+of the LRU like any other.  Entries can also be tagged with the name of the
+source they were computed from (``'edu'``, ``'data'``...) so that a caller
+who knows a source has a new version can ``invalidate`` them in both tiers
+at once.  The tag is part of the file name, so this also drops entries
+written by other processes.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+
+SUFFIX = '.pkl'
+
+
+def _index_digest(index):
+    import pandas as pd
+    return hashlib.sha1(pd.util.hash_pandas_object(index).values.tobytes()
+                        ).hexdigest()
+
+
+def _column_digest(series):
+    import pandas as pd
+    digest = hashlib.sha1(str(series.dtype).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(series, index=False)
+                  .values.tobytes())
+    return digest.hexdigest()
+
+
+def _combine(index_digest, column_digests):
+    return hashlib.sha1(repr((index_digest, column_digests)).encode('utf-8')
+                        ).hexdigest()
+
+
+def fingerprint(frame, columns=None):
+    """Hex digest of ``columns`` of ``frame`` (all of them by default).
+
+    Column names, dtypes, index and values are hashed, so reordering rows,
+    renaming or changing a single value gives a different fingerprint.
+    """
+    if columns is None:
+        columns = list(frame.columns)
+    return FrameDigests(frame).fingerprint(columns)
+
+
+class FrameDigests(object):
+    """Digests of the index and columns of ``frame``, each computed once.
+
+    The digests are kept for as long as this object lives, so it must only
+    be used for a frame that is not changed any more.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self._digests = {}
+
+    def fingerprint(self, columns):
+        """``fingerprint(self.frame, columns)``."""
+        digests = self._digests
+        if None not in digests:
+            digests[None] = _index_digest(self.frame.index)
+        for column in columns:
+            if column not in digests:
+                digests[column] = _column_digest(self.frame[column])
+        return _combine(digests[None], [(c, digests[c]) for c in columns])
+
+
+def make_key(op, input_fingerprint, params):
+    """Key of ``op`` applied with ``params`` to the fingerprinted input."""
+    text = repr((op, input_fingerprint, sorted(params.items())))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _detached(value):
+    """Copy of pandas/numpy results, so callers cannot alter cached ones."""
+    if type(value).__module__.split('.')[0] in ('pandas', 'numpy') and \
+            hasattr(value, 'copy'):
+        return value.copy()
+    return value
+
+
+def _sizeof(value, payload):
+    if hasattr(value, 'memory_usage'):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    return len(payload)
+
+
+class ResultCache(object):
+    """Two-tier (memory, disk) LRU cache of computed results.
+
+    ``max_memory`` and ``max_disk`` are sizes in bytes; ``directory=None``
+    keeps the cache in memory only.  ``stats`` counts ``hits`` (split into
+    ``memory_hits`` and ``disk_hits``), ``misses``, ``evictions`` and
+    ``invalidations``.
+    """
+
+    def __init__(self, directory=None, max_memory=64 * 2 ** 20,
+                 max_disk=512 * 2 ** 20):
+        self.directory = directory
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self._memory = OrderedDict()    # key -> (value, size, tag, fp)
+        self._memory_bytes = 0
+        self.stats = dict.fromkeys(['hits', 'memory_hits', 'disk_hits',
+                                    'misses', 'evictions', 'invalidations'], 0)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    # -- public API ---------------------------------------------------------
+
+    def call(self, op, frame, columns, func, source=None, digests=None,
+             **params):
+        """``func(frame[columns], **params)``, memoized.
+
+        ``op`` names the operation (use the dotted function name); ``source``
+        optionally names the data set ``frame`` comes from, for
+        ``invalidate``; subsets of it can share the name.  ``digests`` is
+        a ``FrameDigests`` of ``frame`` to reuse instead of hashing the
+        columns again.
+        """
+        columns = list(columns)
+        if digests is None:
+            digests = FrameDigests(frame)
+        elif digests.frame is not frame:
+            raise ValueError('digests were computed for another frame')
+        input_fp = digests.fingerprint(columns)
+        key = make_key(op, input_fp, params)
+        found, value = self.get(key)
+        if found:
+            return value
+        value = func(frame[columns], **params)
+        self.put(key, value, source, input_fp)
+        return _detached(value)
+
+    def get(self, key):
+        """``(True, value)`` on a hit, ``(False, None)`` otherwise.
+
+        pandas and numpy values are returned as copies: changing them does
+        not change the cached entry.
+        """
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.stats['hits'] += 1
+            self.stats['memory_hits'] += 1
+            return True, _detached(self._memory[key][0])
+        path = self._disk_path(key)
+        if path:
+            try:
+                with open(path, 'rb') as f:
+                    payload = f.read()
+                value = pickle.loads(payload)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                self._remove_file(path)
+            else:
+                os.utime(path, None)
+                source, input_fp = self._parse_name(path)
+                self._remember(key, value, payload, source, input_fp)
+                self.stats['hits'] += 1
+                self.stats['disk_hits'] += 1
+                return True, _detached(value)
+        self.stats['misses'] += 1
+        return False, None
+
+    def put(self, key, value, source=None, input_fp=''):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, value, payload, source, input_fp)
+        if self.directory:
+            self._write(key, payload, source, input_fp)
+
+    def invalidate(self, source):
+        """Drop every entry computed from ``source``; returns how many.
+
+        Call it when ``source`` has a new version; entries of other sources
+        are left to the LRU.
+        """
+        return self._invalidate(lambda tag: tag == source)
+
+    def clear(self):
+        self._memory.clear()
+        self._memory_bytes = 0
+        for path in self._files():
+            self._remove_file(path)
+
+    def format_stats(self):
+        return ('hits %(hits)d (memory %(memory_hits)d, disk %(disk_hits)d), '
+                'misses %(misses)d, evictions %(evictions)d, '
+                'invalidations %(invalidations)d' % self.stats)
+
+    @property
+    def memory_bytes(self):
+        return self._memory_bytes
+
+    @property
+    def disk_bytes(self):
+        return sum(os.path.getsize(p) for p in self._files())
+
+    def __len__(self):
+        return len(self._memory)
+
+    # -- internals ----------------------------------------------------------
+
+    def _invalidate(self, match):
+        removed = set()
+        for key, (_, size, tag, _) in list(self._memory.items()):
+            if match(tag):
+                del self._memory[key]
+                self._memory_bytes -= size
+                removed.add(key)
+        for path in self._files():
+            if match(self._parse_name(path)[0]):
+                self._remove_file(path)
+                removed.add(os.path.basename(path)[:-len(SUFFIX)].rsplit('-', 1)[1])
+        self.stats['invalidations'] += len(removed)
+        return len(removed)
+
+    def _remember(self, key, value, payload, source, input_fp):
+        size = _sizeof(value, payload)
+        if size > self.max_memory:
+            return
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[1]
+        self._memory[key] = (value, size, source, input_fp)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory:
+            _, (_, old_size, _, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= old_size
+            self.stats['evictions'] += 1
+
+    def _name(self, key, source, input_fp):
+        # source and input fingerprint are kept in the file name so that
+        # invalidation does not need to open the files.
+        return '%s-%s-%s%s' % (source or '_', (input_fp or '_')[:16], key,
+                               SUFFIX)
+
+    def _parse_name(self, path):
+        source, input_fp, _ = os.path.basename(path)[:-len(SUFFIX)].rsplit('-', 2)
+        return (None if source == '_' else source), input_fp
+
+    def _files(self):
+        if not self.directory:
+            return []
+        return [os.path.join(self.directory, n)
+                for n in os.listdir(self.directory) if n.endswith(SUFFIX)]
+
+    def _disk_path(self, key):
+        for path in self._files():
+            if path.endswith('-%s%s' % (key, SUFFIX)):
+                return path
+        return None
+
+    def _write(self, key, payload, source, input_fp):
+        if len(payload) > self.max_disk:
+            return
+        # Write to a temporary file and rename, so a concurrent reader never
+        # sees a partially written entry.
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp, os.path.join(self.directory,
+                                     self._name(key, source, input_fp)))
+        self._evict_disk()
+
+    def _evict_disk(self):
+        entries = []
+        for path in self._files():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(e[1] for e in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk:
+                break
+            self._remove_file(path)
+            total -= size
+            self.stats['evictions'] += 1
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,70 @@
+# coding: utf-8
+"""MovieLens 1M analysis from the "Merge" and "Hands on" sections.
+
+``load`` reads the three files concurrently (see ``loaders``) and merges
+them into the single ``data`` table; the other functions take that table.
+pandas is imported lazily, only by the functions that need it.
+"""
+
+MOVIELENS_DIR = 'ml-1m'
+
+
+def load(directory=MOVIELENS_DIR, executor='thread'):
+    """Return ``(users, ratings, movies, data)`` read from ``directory``."""
+    from loaders import Join, load_sources, merge_movielens, movielens_sources
+    joins = [Join('data', merge_movielens, ('ratings', 'users', 'movies'))]
+    frames = load_sources(movielens_sources(directory), joins,
+                          executor=executor).frames
+    return frames['users'], frames['ratings'], frames['movies'], frames['data']
+
+
+def ratings_per_movie(data, cache=None):
+    """Number of ratings and mean rating per title.
+
+    With a ``memo.ResultCache`` as ``cache`` the aggregate is memoized on the
+    content of the ``title`` and ``rating`` columns.
+    """
+    if cache is not None:
+        return cache.call('movielens.ratings_per_movie', data,
+                          ['title', 'rating'], ratings_per_movie,
+                          source='data')
+    stats = data.groupby('title')['rating'].agg(['size', 'mean'])
+    return stats.rename(columns={'size': 'count'})
+
+
+def popular_movies(data, min_ratings=250, cache=None):
+    """Titles that have received at least ``min_ratings`` ratings."""
+    stats = ratings_per_movie(data, cache=cache)
+    return stats[stats['count'] >= min_ratings].sort_values(
+        by='mean', ascending=False)
+
+
+def _mean_by_title_and_gender(data):
+    import pandas as pd
+    return pd.pivot_table(data, values='rating', index='title',
+                          columns='gender', aggfunc='mean')
+
+
+def mean_ratings_by_gender(data, min_ratings=250, cache=None):
+    """Mean rating per title and gender, for titles with enough ratings."""
+    if cache is not None:
+        means = cache.call('movielens.mean_by_title_and_gender', data,
+                           ['title', 'gender', 'rating'],
+                           _mean_by_title_and_gender, source='data')
+    else:
+        means = _mean_by_title_and_gender(data)
+    return means.loc[popular_movies(data, min_ratings, cache=cache).index]
+
+
+def top_movies(data, user, n=10):
+    """The ``n`` titles ``user`` rated highest.
+
+    Ties between equally rated titles are broken by the mean rating the title
+    got from everybody, then by title so the result is deterministic.
+    """
+    overall = data.groupby('movie_id')['rating'].mean().rename('mean_rating')
+    mine = data.loc[data['user_id'] == user, ['movie_id', 'title', 'rating']]
+    mine = mine.join(overall, on='movie_id')
+    mine = mine.sort_values(by=['rating', 'mean_rating', 'title'],
+                            ascending=[False, False, True])
+    return mine.head(n).reset_index(drop=True)
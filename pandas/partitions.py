@@ -0,0 +1,250 @@
+# coding: utf-8
+"""Month-partitioned storage of the MovieLens ratings.
+
+``ratings.timestamp`` holds epoch seconds.  ``write_partitions`` splits the
+ratings by calendar month (UTC) into one ``.npz`` file per month under a
+directory, and records per partition its row count, file size and the
+min/max of every column in ``manifest.json``.  ``PartitionedRatings`` uses
+those statistics to open only the partitions that overlap a requested time
+range, and keeps a ``ScanStats`` of what was read against what exists so the
+saving is visible.
+
+The windowed aggregations are computed partition by partition and then
+merged: ``ratings_per_day`` adds per-day counts, ``rolling_mean_per_movie``
+adds per-movie daily sums and counts before rolling them over the window.
+"""
+
+import json
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+COLUMNS = ['user_id', 'movie_id', 'rating', 'timestamp']
+MANIFEST = 'manifest.json'
+DAY = 86400
+
+ScanStats = namedtuple('ScanStats', ['partitions_read', 'partitions_total',
+                                     'rows_read', 'rows_total',
+                                     'bytes_read', 'bytes_total'])
+
+
+def month_of(timestamps):
+    """``'YYYY-MM'`` (UTC) of every epoch second in ``timestamps``."""
+    months = np.asarray(timestamps, dtype='datetime64[s]').astype(
+        'datetime64[M]')
+    return np.datetime_as_string(months, unit='M')
+
+
+def _statistics(columns):
+    return dict((name, [int(values.min()), int(values.max())])
+                for name, values in columns.items())
+
+
+def _write_partition(root, month, columns):
+    name = 'month=%s.npz' % month
+    path = os.path.join(root, name)
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, **columns)
+    os.replace(tmp, path)
+    return {'file': name, 'month': month,
+            'rows': int(len(columns['timestamp'])),
+            'bytes': os.path.getsize(path),
+            'stats': _statistics(columns)}
+
+
+def _read_partition(root, entry, columns=None):
+    with np.load(os.path.join(root, entry['file'])) as archive:
+        return dict((c, archive[c]) for c in (columns or COLUMNS))
+
+
+def _keys(columns):
+    return (columns['user_id'].astype(np.int64) << 32) | \
+        columns['movie_id'].astype(np.int64)
+
+
+def _remove_partitions(root):
+    for name in os.listdir(root):
+        if name == MANIFEST or (name.startswith('month=')
+                                and name.endswith('.npz')):
+            os.remove(os.path.join(root, name))
+
+
+def write_partitions(ratings, root, mode='replace'):
+    """Write ``ratings`` to the month partitions in ``root``; returns manifest.
+
+    With ``mode='replace'`` the partitions and manifest already in ``root``
+    are removed first, so building twice gives the same result.  With
+    ``mode='append'`` only the months present in ``ratings`` are rewritten:
+    rows already stored in a partition (same ``user_id`` and ``movie_id``)
+    are skipped and the others appended, so appending an extract that
+    overlaps what is stored does not duplicate ratings.
+    """
+    if mode not in ('replace', 'append'):
+        raise ValueError("mode must be 'replace' or 'append', not %r" % mode)
+    os.makedirs(root, exist_ok=True)
+    if mode == 'replace':
+        _remove_partitions(root)
+    manifest = read_manifest(root)
+    entries = dict((e['month'], e) for e in manifest['partitions'])
+    data = dict((c, ratings[c].to_numpy()) for c in COLUMNS)
+    months = month_of(data['timestamp'])
+    order = np.argsort(months, kind='stable')
+    months = months[order]
+    bounds = np.flatnonzero(months[1:] != months[:-1]) + 1
+    for chunk in np.split(np.arange(len(order)), bounds):
+        if not len(chunk):
+            continue
+        month = str(months[chunk[0]])
+        columns = dict((c, data[c][order[chunk]]) for c in COLUMNS)
+        if month in entries:
+            old = _read_partition(root, entries[month])
+            new = ~np.isin(_keys(columns), _keys(old))
+            if not new.any():
+                continue
+            columns = dict((c, np.concatenate([old[c], columns[c][new]]))
+                           for c in COLUMNS)
+        entries[month] = _write_partition(root, month, columns)
+    manifest['partitions'] = [entries[m] for m in sorted(entries)]
+    tmp = os.path.join(root, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, os.path.join(root, MANIFEST))
+    return manifest
+
+
+def read_manifest(root):
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return {'partitions': []}
+    with open(path) as f:
+        return json.load(f)
+
+
+class PartitionedRatings(object):
+    """Read side of a month-partitioned ratings directory."""
+
+    def __init__(self, root):
+        self.root = root
+        self.partitions = read_manifest(root)['partitions']
+        self.last_scan = None
+
+    @property
+    def min_timestamp(self):
+        return min(p['stats']['timestamp'][0] for p in self.partitions)
+
+    @property
+    def max_timestamp(self):
+        return max(p['stats']['timestamp'][1] for p in self.partitions)
+
+    def prune(self, start=None, end=None):
+        """Partitions whose timestamp range overlaps ``[start, end)``."""
+        return [p for p in self.partitions
+                if (start is None or p['stats']['timestamp'][1] >= start)
+                and (end is None or p['stats']['timestamp'][0] < end)]
+
+    def scan(self, start=None, end=None, columns=None):
+        """Yield one dict of column arrays per partition in the range.
+
+        Rows outside ``[start, end)`` are filtered out.  ``last_scan`` holds
+        the ``ScanStats`` of the scan once it is exhausted.
+        """
+        columns = list(columns or COLUMNS)
+        wanted = columns if 'timestamp' in columns else columns + ['timestamp']
+        selected = self.prune(start, end)
+        for entry in selected:
+            part = _read_partition(self.root, entry, wanted)
+            ts = part['timestamp']
+            keep = np.ones(len(ts), dtype=bool)
+            if start is not None and entry['stats']['timestamp'][0] < start:
+                keep &= ts >= start
+            if end is not None and entry['stats']['timestamp'][1] >= end:
+                keep &= ts < end
+            if not keep.all():
+                part = dict((c, v[keep]) for c, v in part.items())
+            yield dict((c, part[c]) for c in columns)
+        self.last_scan = ScanStats(
+            len(selected), len(self.partitions),
+            sum(p['rows'] for p in selected),
+            sum(p['rows'] for p in self.partitions),
+            sum(p['bytes'] for p in selected),
+            sum(p['bytes'] for p in self.partitions))
+
+    def last_days(self, days):
+        """``(start, end)`` covering the last ``days`` days of ratings."""
+        end = self.max_timestamp + 1
+        return end - days * DAY, end
+
+    # -- windowed aggregations ----------------------------------------------
+
+    def ratings_per_day(self, start=None, end=None):
+        """Number of ratings per UTC day, as a Series indexed by date."""
+        import pandas as pd
+        totals = None
+        for part in self.scan(start, end, ['timestamp']):
+            days, counts = np.unique(part['timestamp'] // DAY,
+                                     return_counts=True)
+            counts = pd.Series(counts, index=days)
+            totals = counts if totals is None else totals.add(counts,
+                                                              fill_value=0)
+        if totals is None:
+            return pd.Series([], dtype='int64', name='ratings')
+        totals.index = pd.to_datetime(totals.index * DAY, unit='s')
+        totals.index.name = 'day'
+        return totals.astype('int64').rename('ratings')
+
+    def rolling_mean_per_movie(self, start=None, end=None, days=7):
+        """Rolling mean rating of each movie, indexed by ``(movie_id, day)``.
+
+        The window covers the ``days`` days ending on each day the movie was
+        rated.  Partitions are reduced to per-(movie, day) sums and counts first; the
+        window is then rolled over the merged daily values.  Ratings from the
+        ``days - 1`` days before ``start`` are read so that the first windows
+        are complete.
+        """
+        import pandas as pd
+        read_from = None if start is None else start - (days - 1) * DAY
+        daily = []
+        for part in self.scan(read_from, end, ['movie_id', 'rating',
+                                               'timestamp']):
+            frame = pd.DataFrame({'movie_id': part['movie_id'],
+                                  'day': part['timestamp'] // DAY,
+                                  'rating': part['rating']})
+            daily.append(frame.groupby(['movie_id', 'day'])['rating']
+                         .agg(['sum', 'count']))
+        if not daily:
+            return pd.Series([], dtype='float64', name='rolling_mean')
+        daily = pd.concat(daily).groupby(level=[0, 1]).sum().reset_index()
+        daily['day'] = pd.to_datetime(daily['day'] * DAY, unit='s')
+        rolled = (daily.set_index('day').groupby('movie_id')[['sum', 'count']]
+                  .rolling('%dD' % days).sum())
+        mean = (rolled['sum'] / rolled['count']).rename('rolling_mean')
+        if start is not None:
+            first_day = pd.Timestamp((start // DAY) * DAY, unit='s')
+            mean = mean[mean.index.get_level_values('day') >= first_day]
+        return mean
+
+
+def format_scan(stats):
+    """``'read 2/35 partitions, 1.2% of rows, 1.3% of bytes'``."""
+    return 'read %d/%d partitions, %d/%d rows (%.1f%%), %d/%d bytes (%.1f%%)' % (
+        stats.partitions_read, stats.partitions_total,
+        stats.rows_read, stats.rows_total,
+        100.0 * stats.rows_read / max(stats.rows_total, 1),
+        stats.bytes_read, stats.bytes_total,
+        100.0 * stats.bytes_read / max(stats.bytes_total, 1))
+
+
+def typical_windows(store):
+    """Scan statistics and timings of the windows we use most often."""
+    import pandas  # noqa: F401  (outside the timings)
+    report = []
+    end = store.max_timestamp + 1
+    for label, days in (('last 7 days', 7), ('last 30 days', 30),
+                        ('last 90 days', 90), ('everything', None)):
+        start = None if days is None else end - days * DAY
+        t0 = time.perf_counter()
+        store.ratings_per_day(start, end)
+        report.append((label, store.last_scan, time.perf_counter() - t0))
+    return report
@@ -0,0 +1,59 @@
+# coding: utf-8
+"""The two plots of the notebook's "Plotting" section.
+
+matplotlib is only imported when a plot is drawn.  When the backend it
+selects cannot show figures (no display, as under cron or CI, where it falls
+back to Agg) figures are written to files instead: to ``output`` when given,
+otherwise to a default file name in the current directory.  Every plot function returns
+the path it wrote, or None when the figure was shown on screen.
+"""
+
+MY_COLORS = ['b', 'r', 'g', 'y', 'm', 'c']
+
+
+def headless():
+    """True when matplotlib's backend cannot show figures on screen."""
+    import matplotlib
+    try:
+        from matplotlib.backends import BackendFilter, backend_registry
+        non_interactive = backend_registry.list_builtin(
+            BackendFilter.NON_INTERACTIVE)
+    except ImportError:                 # matplotlib < 3.9
+        from matplotlib.rcsetup import non_interactive_bk as non_interactive
+    return matplotlib.get_backend().lower() in [b.lower()
+                                                for b in non_interactive]
+
+
+def _pyplot():
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _finish(plt, fig, output, default):
+    if not output and headless():
+        output = default
+    if output:
+        fig.savefig(output, dpi=300, bbox_inches='tight')
+        plt.close(fig)
+    else:
+        plt.show()
+    return output
+
+
+def plot_total_by_country(pivedu, output=None):
+    """Bar plot of the sum over the years for each country."""
+    plt = _pyplot()
+    fig = plt.figure(figsize=(12, 5))
+    totalSum = pivedu.sum(axis=1).sort_values(ascending=False)
+    totalSum.plot(kind='bar', style='b', alpha=0.4,
+                  title='Total Values for Country', ax=fig.gca())
+    return _finish(plt, fig, output, 'total_by_country.png')
+
+
+def plot_value_by_year(pivedu, output=None):
+    """Horizontal stacked bars, one segment per year, legend outside."""
+    plt = _pyplot()
+    ax = pivedu.plot(kind='barh', stacked=True, color=MY_COLORS,
+                     figsize=(12, 6))
+    ax.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+    return _finish(plt, ax.get_figure(), output, 'value_by_year.png')
@@ -0,0 +1,378 @@
+# coding: utf-8
+"""Asyncio HTTP service for ``top_movies`` and per-movie aggregate lookups.
+
+The ratings are loaded once into a compact, read-only ``RatingsIndex``:
+the ratings sorted by user (and, within a user, in ``top_movies`` order)
+as parallel ``int32``/``int8`` arrays with CSR offsets per user, plus dense
+per-movie count and mean arrays.  A lookup for many users at once is then
+a few numpy gathers.
+
+Requests arriving within ``window`` seconds of each other are coalesced by
+a ``Batcher`` into one vectorized lookup; answers for hot users are kept in
+an LRU cache.  ``/stats`` reports latency percentiles and throughput.
+
+Endpoints (all ``GET``, JSON answers)::
+
+    /top_movies?user=ID[&n=N]
+    /movie?id=ID
+    /stats
+    /health
+
+Only the standard library, numpy and (to read the files) pandas are used.
+"""
+
+import asyncio
+import json
+import time
+import traceback
+from collections import OrderedDict, deque
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+DEFAULT_N = 10
+MAX_N = 100
+INT64 = np.iinfo(np.int64)
+
+
+def parse_id(text):
+    """``text`` as an int; ValueError unless it fits in an ``int64``."""
+    value = int(text)
+    if not INT64.min <= value <= INT64.max:
+        raise ValueError('%s does not fit in an int64' % text)
+    return value
+
+
+class RatingsIndex(object):
+    """Ratings grouped by user in ``top_movies`` order, plus movie aggregates."""
+
+    def __init__(self, ratings, movies):
+        user_ids = ratings['user_id'].to_numpy()
+        movie_ids = ratings['movie_id'].to_numpy()
+        rating = ratings['rating'].to_numpy()
+
+        size = int(max(movie_ids.max(), movies['movie_id'].max())) + 1
+        self.movie_count = np.bincount(movie_ids, minlength=size)
+        sums = np.bincount(movie_ids, rating.astype(np.float64), size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.movie_mean = sums / self.movie_count
+        self.titles = np.empty(size, dtype=object)
+        self.titles[movies['movie_id'].to_numpy()] = movies['title'].to_numpy()
+        self.genres = np.empty(size, dtype=object)
+        self.genres[movies['movie_id'].to_numpy()] = movies['genres'].to_numpy()
+
+        # Same order as movielens.top_movies: rating, then overall mean
+        # rating (both descending), then title.
+        title_rank = np.zeros(size, dtype=np.int64)
+        known = movies['movie_id'].to_numpy()
+        title_rank[known[np.argsort(movies['title'].to_numpy(),
+                                    kind='stable')]] = np.arange(len(known))
+        order = np.lexsort((title_rank[movie_ids], -self.movie_mean[movie_ids],
+                            -rating, user_ids))
+        self.movie_ids = movie_ids[order].astype(np.int32)
+        self.ratings = rating[order].astype(np.int8)
+        counts = np.bincount(user_ids[order])
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.movie_ids, self.ratings,
+                                      self.offsets, self.movie_count,
+                                      self.movie_mean))
+
+    def top_movies_batch(self, users, n):
+        """Top ``n`` ``(movie_ids, ratings)`` of each user, one gather.
+
+        Unknown users get empty arrays.
+        """
+        users = np.asarray(users, dtype=np.int64)
+        valid = (users >= 0) & (users < len(self.offsets) - 1)
+        safe = np.where(valid, users, 0)
+        starts = self.offsets[safe]
+        lengths = np.where(valid, np.minimum(self.offsets[safe + 1] - starts,
+                                             n), 0)
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths,
+                              lengths) + np.arange(lengths.sum())
+        movie_ids = np.split(self.movie_ids[positions], np.cumsum(lengths)[:-1])
+        ratings = np.split(self.ratings[positions], np.cumsum(lengths)[:-1])
+        return list(zip(movie_ids, ratings))
+
+    def movies_batch(self, movie_ids):
+        """``(count, mean)`` of each movie; ``count`` is 0 when unknown."""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        valid = (movie_ids >= 0) & (movie_ids < len(self.movie_count))
+        safe = np.where(valid, movie_ids, 0)
+        return (np.where(valid, self.movie_count[safe], 0),
+                np.where(valid, self.movie_mean[safe], np.nan))
+
+    def top_movies_document(self, user, movie_ids, ratings):
+        return {'user': int(user), 'movies': [
+            {'movie_id': int(m), 'title': self.titles[m], 'rating': int(r),
+             'mean_rating': round(float(self.movie_mean[m]), 4)}
+            for m, r in zip(movie_ids, ratings)]}
+
+    def movie_document(self, movie_id, count, mean):
+        return {'movie_id': int(movie_id), 'title': self.titles[movie_id],
+                'genres': self.genres[movie_id], 'count': int(count),
+                'mean_rating': round(float(mean), 4)}
+
+
+class LRUCache(object):
+    def __init__(self, size):
+        self.size = size
+        self.data = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        if key in self.data:
+            self.data.move_to_end(key)
+            self.hits += 1
+            return self.data[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.size:
+            self.data.popitem(last=False)
+
+
+class Batcher(object):
+    """Coalesce the keys requested within ``window`` seconds into one call.
+
+    ``lookup`` receives the list of distinct keys and returns one result per
+    key.  A batch is flushed ``window`` seconds after its first key, or as
+    soon as it holds ``max_batch`` keys.
+    """
+
+    def __init__(self, lookup, window=0.002, max_batch=512):
+        self.lookup = lookup
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = OrderedDict()      # key -> [futures]
+        self.timer = None
+        self.batches = self.keys = 0
+
+    def submit(self, key):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.setdefault(key, []).append(future)
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+        return future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        pending, self.pending = self.pending, OrderedDict()
+        if not pending:
+            return
+        keys = list(pending)
+        self.batches += 1
+        self.keys += len(keys)
+        try:
+            results = self.lookup(keys)
+        except Exception as exc:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exc)
+            return
+        for key, result in zip(keys, results):
+            for future in pending[key]:
+                if not future.done():
+                    future.set_result(result)
+
+
+class Metrics(object):
+    """Latencies of the last ``keep`` requests and request counts."""
+
+    def __init__(self, keep=100000):
+        self.latencies = deque(maxlen=keep)
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.recent = deque(maxlen=keep)  # completion times, for the rate
+
+    def record(self, seconds):
+        now = time.perf_counter()
+        self.requests += 1
+        self.latencies.append(seconds)
+        self.recent.append(now)
+
+    def snapshot(self):
+        now = time.perf_counter()
+        uptime = now - self.started
+        window = [t for t in self.recent if t >= now - 10]
+        result = {'requests': self.requests,
+                  'uptime_s': round(uptime, 3),
+                  'throughput_rps': round(self.requests / uptime, 1)
+                  if uptime else 0.0,
+                  'recent_rps': round(len(window) / min(10.0, uptime), 1)
+                  if uptime else 0.0}
+        if self.latencies:
+            values = np.fromiter(self.latencies, dtype=np.float64)
+            for p in (50, 90, 99, 99.9):
+                result['p%s_ms' % p] = round(
+                    float(np.percentile(values, p)) * 1000, 3)
+            result['max_ms'] = round(float(values.max()) * 1000, 3)
+        return result
+
+
+class QueryService(object):
+    """Routes, batching, caching and metrics around a ``RatingsIndex``."""
+
+    def __init__(self, index, window=0.002, max_batch=512, cache_size=4096):
+        self.index = index
+        self.cache = LRUCache(cache_size)
+        self.metrics = Metrics()
+        self.top_batcher = Batcher(self._lookup_top, window, max_batch)
+        self.movie_batcher = Batcher(self._lookup_movies, window, max_batch)
+
+    def _lookup_top(self, keys):
+        # All keys of a batch share one gather; n is the largest requested.
+        users = [user for user, _ in keys]
+        n_max = max(n for _, n in keys)
+        found = self.index.top_movies_batch(users, n_max)
+        results = []
+        for (user, n), (movie_ids, ratings) in zip(keys, found):
+            if not len(movie_ids):
+                results.append(None)
+                continue
+            body = json.dumps(self.index.top_movies_document(
+                user, movie_ids[:n], ratings[:n])).encode('utf-8')
+            self.cache.put(('top', user, n), body)
+            results.append(body)
+        return results
+
+    def _lookup_movies(self, keys):
+        counts, means = self.index.movies_batch(keys)
+        results = []
+        for movie_id, count, mean in zip(keys, counts, means):
+            if not count:
+                results.append(None)
+                continue
+            body = json.dumps(self.index.movie_document(
+                movie_id, count, mean)).encode('utf-8')
+            self.cache.put(('movie', movie_id), body)
+            results.append(body)
+        return results
+
+    async def route(self, target):
+        """``(status, body)`` for a request target such as ``/movie?id=1``."""
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        try:
+            if url.path == '/top_movies':
+                user = parse_id(query['user'][0])
+                n = int(query.get('n', [DEFAULT_N])[0])
+                if n < 1:
+                    raise ValueError('n must be at least 1')
+                n = min(n, MAX_N)
+                key, batcher, batch_key = ('top', user, n), self.top_batcher, \
+                    (user, n)
+            elif url.path == '/movie':
+                movie_id = parse_id(query['id'][0])
+                key, batcher, batch_key = ('movie', movie_id), \
+                    self.movie_batcher, movie_id
+            elif url.path == '/stats':
+                return 200, json.dumps(self.stats()).encode('utf-8')
+            elif url.path == '/health':
+                return 200, b'{"status": "ok"}'
+            else:
+                return 404, b'{"error": "unknown path"}'
+        except (KeyError, ValueError):
+            return 400, b'{"error": "bad or missing parameter"}'
+        body = self.cache.get(key)
+        if body is None:
+            body = await batcher.submit(batch_key)
+        if body is None:
+            return 404, b'{"error": "not found"}'
+        return 200, body
+
+    def stats(self):
+        stats = self.metrics.snapshot()
+        batches = self.top_batcher.batches + self.movie_batcher.batches
+        keys = self.top_batcher.keys + self.movie_batcher.keys
+        stats.update({
+            'batches': batches,
+            'mean_batch_size': round(keys / batches, 2) if batches else 0.0,
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+            'index_bytes': self.index.nbytes,
+        })
+        return stats
+
+    async def handle(self, reader, writer):
+        """One HTTP/1.1 connection; keep-alive unless the client closes."""
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+                   405: 'Method Not Allowed', 500: 'Internal Server Error'}
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                close = False
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    if name.strip().lower() == 'connection' and \
+                            value.strip().lower() == 'close':
+                        close = True
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    break
+                method, target, version = parts
+                close = close or version == 'HTTP/1.0'
+                if method != 'GET':
+                    status, body = 405, b'{"error": "only GET"}'
+                else:
+                    try:
+                        status, body = await self.route(target)
+                    except Exception:
+                        traceback.print_exc()
+                        status, body = 500, b'{"error": "internal error"}'
+                writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json'
+                              '\r\nContent-Length: %d\r\n%s\r\n' % (
+                                  status, reasons[status], len(body),
+                                  'Connection: close\r\n' if close else '')
+                              ).encode('latin-1') + body)
+                await writer.drain()
+                self.metrics.record(time.perf_counter() - start)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def build_index(directory='ml-1m'):
+    """Read the MovieLens files once and build the ``RatingsIndex``."""
+    from loaders import load_sources, movielens_sources
+    frames = load_sources([s for s in movielens_sources(directory)
+                           if s.name in ('ratings', 'movies')]).frames
+    return RatingsIndex(frames['ratings'], frames['movies'])
+
+
+async def serve(index, host='127.0.0.1', port=8000, **options):
+    service = QueryService(index, **options)
+    server = await asyncio.start_server(service.handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def run(directory='ml-1m', host='127.0.0.1', port=8000, **options):
+    index = build_index(directory)
+    print('index of %d ratings, %.1f MiB; serving on http://%s:%d' % (
+        len(index.movie_ids), index.nbytes / 2.0 ** 20, host, port))
+    try:
+        asyncio.run(serve(index, host, port, **options))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,240 @@
+# coding: utf-8
+"""Bulk "Load" step of the ETL into a local SQLite database.
+
+Row by row inserts (``to_sql`` with a small ``chunksize``, or a loop of
+``execute``) spend their time converting values one at a time and committing
+often, which makes the load the slowest step of the pipeline.
+``bulk_load`` instead:
+
+* turns each column of a batch into a list of plain Python values with the
+  column's SQLite type (no per-row conversion in Python),
+* pushes the batches through ``executemany`` inside large explicit
+  transactions (``transaction_rows`` rows per ``COMMIT``),
+* applies bulk-load pragmas (journal, synchronous, cache) for the connection,
+* creates the indexes after the data is in, including the key: it is
+  enforced by a UNIQUE index rather than a PRIMARY KEY in ``CREATE TABLE``,
+  so rows are not inserted into a B-tree one at a time, and
+* optionally upserts on the key (``INSERT ... ON CONFLICT``); the unique
+  index is then created before the rows, as the conflict target needs it.
+
+Every call returns a ``LoadReport`` with the throughput in rows per second.
+"""
+
+import sqlite3
+import time
+from collections import OrderedDict, namedtuple
+
+# Meant for a local store that can be rebuilt from the sources: with
+# synchronous OFF a power loss in the middle of a load can corrupt the file.
+BULK_PRAGMAS = OrderedDict([
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'OFF'),
+    ('temp_store', 'MEMORY'),
+    ('cache_size', -256 * 1024),        # in KiB when negative: 256 MiB
+])
+
+LoadReport = namedtuple('LoadReport', ['table', 'rows', 'batches', 'seconds',
+                                       'rows_per_second'])
+
+
+def quote(name):
+    return '"%s"' % str(name).replace('"', '""')
+
+
+def sqlite_type(dtype):
+    """SQLite column type of a pandas/numpy dtype."""
+    kind = getattr(dtype, 'kind', 'O')
+    if kind in 'biu':
+        return 'INTEGER'
+    if kind == 'f':
+        return 'REAL'
+    return 'TEXT'
+
+
+def apply_pragmas(conn, pragmas=None):
+    for name, value in (BULK_PRAGMAS if pragmas is None else pragmas).items():
+        conn.execute('PRAGMA %s = %s' % (name, value))
+
+
+def _prepare(frame, index):
+    """Frame with the index as leading column(s) when ``index`` is true."""
+    if index:
+        frame = frame.reset_index()
+    return frame.rename(columns=str)
+
+
+def _column_values(series):
+    """Plain Python values of ``series``, nulls as ``None``."""
+    kind = series.dtype.kind
+    if kind == 'M':
+        values = series.dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
+    else:
+        values = series.to_numpy().tolist()
+    if series.hasnans:
+        nulls = series.isnull().to_numpy()
+        values = [None if n else v for v, n in zip(values, nulls)]
+    return values
+
+
+def create_table(conn, table, frame, primary_key=None, if_exists='replace'):
+    """Create ``table`` for the columns of ``frame``.
+
+    ``if_exists`` is ``'replace'`` (drop first), ``'append'`` (keep an
+    existing table) or ``'fail'``.
+    """
+    if if_exists not in ('replace', 'append', 'fail'):
+        raise ValueError("if_exists must be 'replace', 'append' or 'fail'")
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                          "AND name = ?", (table,)).fetchone()
+    if exists:
+        if if_exists == 'fail':
+            raise ValueError('table %r already exists' % table)
+        if if_exists == 'append':
+            return
+        conn.execute('DROP TABLE %s' % quote(table))
+    columns = ['%s %s' % (quote(c), sqlite_type(frame[c].dtype))
+               for c in frame.columns]
+    if primary_key:
+        columns.append('PRIMARY KEY (%s)'
+                       % ', '.join(quote(c) for c in primary_key))
+    conn.execute('CREATE TABLE %s (%s)' % (quote(table), ', '.join(columns)))
+
+
+def create_index(conn, table, columns, unique=False):
+    """``CREATE [UNIQUE] INDEX IF NOT EXISTS`` on ``columns`` of ``table``."""
+    columns = [str(c) for c in columns]
+    name = '%s_%s_%s' % ('ux' if unique else 'ix', table, '_'.join(columns))
+    conn.execute('CREATE %sINDEX IF NOT EXISTS %s ON %s (%s)' % (
+        'UNIQUE ' if unique else '', quote(name), quote(table),
+        ', '.join(quote(c) for c in columns)))
+
+
+def insert_statement(table, columns, primary_key=None, upsert=False):
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        quote(table), ', '.join(quote(c) for c in columns),
+        ', '.join('?' * len(columns)))
+    if upsert:
+        if not primary_key:
+            raise ValueError('upsert needs a primary key')
+        updates = [c for c in columns if c not in primary_key]
+        sql += ' ON CONFLICT (%s) DO %s' % (
+            ', '.join(quote(c) for c in primary_key),
+            'UPDATE SET ' + ', '.join('%s = excluded.%s' % (quote(c), quote(c))
+                                      for c in updates)
+            if updates else 'NOTHING')
+    return sql
+
+
+def bulk_load(conn, frame, table, batch_size=50000, transaction_rows=None,
+              index=False, primary_key=None, upsert=False, indexes=(),
+              if_exists='replace', pragmas=None):
+    """Load ``frame`` into ``table``; returns a ``LoadReport``.
+
+    ``batch_size`` rows go to each ``executemany`` call and
+    ``transaction_rows`` rows (default: everything) to each transaction.
+    ``indexes`` is a list of column lists, created once the rows are in.
+    ``primary_key`` is enforced by a unique index, also created after the
+    rows unless ``upsert`` is set: then rows whose key exists replace the
+    stored ones, and an existing table is kept.
+
+    When ``transaction_rows`` commits a plain load in several transactions,
+    the rows go to a staging table first; the last transaction moves them
+    into ``table`` and builds the indexes, so a failed load (a duplicate
+    key, say) leaves ``table`` as it was.
+    """
+    start = time.perf_counter()
+    frame = _prepare(frame, index)
+    columns = list(frame.columns)
+    primary_key = [str(c) for c in primary_key] if primary_key else None
+    staging = '%s_staging' % table if transaction_rows and not upsert \
+        else None
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None         # explicit BEGIN/COMMIT below
+    try:
+        apply_pragmas(conn, pragmas)
+        conn.execute('BEGIN')
+        if staging:
+            # Only checks 'fail' and creates a missing table: an existing
+            # one is replaced at the end.
+            create_table(conn, table, frame, None,
+                         'fail' if if_exists == 'fail' else 'append')
+            create_table(conn, staging, frame, None, 'replace')
+        else:
+            create_table(conn, table, frame, None,
+                         'append' if upsert else if_exists)
+        if upsert and primary_key:
+            create_index(conn, table, primary_key, unique=True)
+        sql = insert_statement(staging or table, columns, primary_key, upsert)
+        rows = batches = in_transaction = 0
+        for offset in range(0, len(frame), batch_size):
+            batch = frame.iloc[offset:offset + batch_size]
+            values = [_column_values(batch[c]) for c in columns]
+            conn.executemany(sql, zip(*values))
+            rows += len(batch)
+            batches += 1
+            in_transaction += len(batch)
+            if transaction_rows and in_transaction >= transaction_rows:
+                conn.execute('COMMIT')
+                conn.execute('BEGIN')
+                in_transaction = 0
+        if staging and if_exists == 'replace':
+            conn.execute('DROP TABLE %s' % quote(table))
+            conn.execute('ALTER TABLE %s RENAME TO %s'
+                         % (quote(staging), quote(table)))
+        elif staging:
+            names = ', '.join(quote(c) for c in columns)
+            conn.execute('INSERT INTO %s (%s) SELECT %s FROM %s' % (
+                quote(table), names, names, quote(staging)))
+            conn.execute('DROP TABLE %s' % quote(staging))
+        if primary_key and not upsert:
+            create_index(conn, table, primary_key, unique=True)
+        for index_columns in indexes:
+            create_index(conn, table, index_columns)
+        conn.execute('COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        if staging:
+            conn.execute('DROP TABLE IF EXISTS %s' % quote(staging))
+        raise
+    finally:
+        conn.isolation_level = isolation_level
+    seconds = time.perf_counter() - start
+    return LoadReport(table, rows, batches, seconds,
+                      rows / seconds if seconds else float('inf'))
+
+
+def load_toolbox(path, edu=None, pivedu=None, data=None, batch_size=50000,
+                 transaction_rows=None, upsert=False, pragmas=None):
+    """Load the cleaned notebook tables into the SQLite file ``path``.
+
+    ``edu`` goes to ``edu`` (key ``TIME, GEO``), ``pivedu`` to ``pivedu``
+    (key ``GEO``, one column per year) and the merged MovieLens ``data`` to
+    ``ratings`` (key ``user_id, movie_id``).  Returns the ``LoadReport`` of
+    each table that was given.
+    """
+    plan = [
+        ('edu', edu, dict(primary_key=['TIME', 'GEO'], indexes=[['GEO']])),
+        ('pivedu', pivedu, dict(index=True, primary_key=['GEO'])),
+        ('ratings', data, dict(primary_key=['user_id', 'movie_id'],
+                               indexes=[['movie_id'], ['gender', 'age'],
+                                        ['timestamp']])),
+    ]
+    reports = []
+    conn = sqlite3.connect(path)
+    try:
+        for table, frame, options in plan:
+            if frame is not None:
+                reports.append(bulk_load(
+                    conn, frame, table, batch_size=batch_size,
+                    transaction_rows=transaction_rows, upsert=upsert,
+                    pragmas=pragmas, **options))
+    finally:
+        conn.close()
+    return reports
+
+
+def format_report(report):
+    return '%-8s %9d rows in %7.3f s: %10.0f rows/s (%d batches)' % (
+        report.table, report.rows, report.seconds, report.rows_per_second,
+        report.batches)
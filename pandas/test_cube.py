@@ -0,0 +1,61 @@
+# coding: utf-8
+import pandas as pd
+
+import cube
+
+USERS = pd.DataFrame({'user_id': [1, 2], 'gender': ['F', 'M'],
+                      'age': [18, 25], 'occupation': [0, 12],
+                      'zip': ['05306', '98107-4616']})
+MOVIES = pd.DataFrame({'movie_id': [10, 20], 'title': ['A (1999)', 'B (2000)'],
+                       'genres': ['Drama', 'Comedy|Drama']})
+RATINGS = pd.DataFrame({'user_id': [1, 2], 'movie_id': [10, 20],
+                        'rating': [4, 2], 'timestamp': [1000, 2000]})
+
+
+def test_update_adds_rating_with_same_timestamp_as_newest():
+    ratings_cube = cube.RatingsCube.build(RATINGS, USERS, MOVIES,
+                                          dims=('gender',))
+    late = pd.DataFrame({'user_id': [1], 'movie_id': [20], 'rating': [5],
+                         'timestamp': [2000]})
+    added = ratings_cube.update(pd.concat([RATINGS, late]), USERS, MOVIES)
+    assert added == 1
+    assert ratings_cube.to_series('count').tolist() == [2, 1]
+
+
+def test_update_adds_backfilled_rating_and_skips_known_ones(tmp_path):
+    ratings_cube = cube.RatingsCube.build(RATINGS, USERS, MOVIES,
+                                          dims=('gender', 'genre'))
+    ratings_cube.save(str(tmp_path / 'cube.npz'))
+    loaded = cube.RatingsCube.load(str(tmp_path / 'cube.npz'))
+    old = pd.DataFrame({'user_id': [2], 'movie_id': [10], 'rating': [3],
+                        'timestamp': [1]})
+    assert loaded.update(pd.concat([RATINGS, old]), USERS, MOVIES) == 1
+    assert loaded.update(pd.concat([RATINGS, old]), USERS, MOVIES) == 0
+    drama = loaded.slice(genre='Drama').to_series('sum')
+    assert drama.tolist() == [4, 5]
+
+
+def test_cli_query_parses_where_values_by_dimension(tmp_path, capsys):
+    import cli
+    path = str(tmp_path / 'cube.npz')
+    cube.RatingsCube.build(RATINGS, USERS, MOVIES,
+                           dims=('age', 'zip')).save(path)
+    cli.main(['cube', 'query', '--cube', path, '--stat', 'count',
+              '--by', 'zip', '--where', 'zip=0,9', 'age=18'])
+    assert capsys.readouterr().out.split() == ['zip', '0', '1.0', '9', '0.0']
+
+
+def test_cli_cube_path_without_suffix(tmp_path, monkeypatch, capsys):
+    import cli
+    import movielens
+    monkeypatch.setattr(movielens, 'load',
+                        lambda directory: (USERS, RATINGS, MOVIES, None))
+    path = str(tmp_path / 'cube')
+    cli.main(['cube', 'build', '--cube', path, '--dims', 'gender'])
+    cli.main(['cube', 'update', '--cube', path])
+    cli.main(['cube', 'query', '--cube', path, '--by', 'gender',
+              '--stat', 'count'])
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].startswith('2 ratings added')
+    assert out[1].startswith('0 ratings added')
+    assert out[2:] == ['gender', 'F         1.0', 'M         1.0']
@@ -0,0 +1,58 @@
+# coding: utf-8
+import time
+
+import pandas as pd
+import pytest
+
+import loaders
+
+
+def _frame(path, delay=0.0):
+    time.sleep(delay)
+    if path == 'missing':
+        raise IOError('no such file')
+    return pd.DataFrame({'k': [1, 2], path: [path, path]})
+
+
+def _merge(*frames):
+    merged = frames[0]
+    for frame in frames[1:]:
+        merged = pd.merge(merged, frame)
+    return merged
+
+
+def test_results_follow_declaration_order():
+    sources = [loaders.Source('slow', _frame, 'slow', {'delay': 0.2}),
+               loaders.Source('fast', _frame, 'fast')]
+    joins = [loaders.Join('both', _merge, ('fast', 'slow')),
+             loaders.Join('again', _merge, ('both', 'slow'))]
+    result = loaders.load_sources(sources, joins)
+    assert list(result.frames) == ['slow', 'fast', 'both', 'again']
+    assert list(result.timings) == ['slow', 'fast', 'both', 'again']
+    assert list(result.frames['again'].columns) == ['k', 'fast', 'slow']
+    assert result.timings['slow'] >= 0.2
+
+
+def test_failed_source_is_reported_and_dependent_joins_skipped():
+    sources = [loaders.Source('ok', _frame, 'ok'),
+               loaders.Source('bad', _frame, 'missing')]
+    joins = [loaders.Join('uses_bad', _merge, ('ok', 'bad')),
+             loaders.Join('uses_join', _merge, ('uses_bad',)),
+             loaders.Join('uses_ok', _merge, ('ok',))]
+    with pytest.raises(loaders.LoadError) as caught:
+        loaders.load_sources(sources, joins)
+    errors = caught.value.errors
+    assert list(errors) == ['bad', 'uses_bad', 'uses_join']
+    assert errors['bad'].path == 'missing'
+    assert isinstance(errors['bad'].cause, IOError)
+    assert 'skipped' in str(errors['uses_join'])
+    assert 'bad (missing): OSError: no such file' in str(caught.value)
+
+
+@pytest.mark.parametrize('joins', [
+    [loaders.Join('j', _merge, ('a', 'j'))],
+    [loaders.Join('j', _merge, ('a', 'k')), loaders.Join('k', _merge, ('j',))],
+])
+def test_join_cycles_are_rejected(joins):
+    with pytest.raises(ValueError, match='cycle'):
+        loaders.load_sources([loaders.Source('a', _frame, 'a')], joins)
@@ -0,0 +1,85 @@
+# coding: utf-8
+import numpy as np
+import pandas as pd
+import pytest
+
+import masked
+
+EDU = pd.DataFrame({'TIME': [2000, 2001, 2002, 2003, 2004, 2005, 2006, 2007,
+                             2008, 2009],
+                    'Value': [1.5, np.nan, 3.0, np.nan, 5.0, 6.0, np.nan,
+                              8.0, 9.5, np.nan],
+                    'Flag': [np.nan, 1.0, 1.0, 2.0, np.nan, 1.0, 1.0, 2.0,
+                             1.0, 1.0]},
+                   index=list('abcdefghij'))
+
+
+@pytest.fixture(autouse=True)
+def reset_copies():
+    masked.copies.reset()
+
+
+def test_getitem_accepts_negative_rows():
+    column = masked.MaskedFrame.from_frame(EDU).fillna({'Value': 0})['Value']
+    assert [column[i] for i in range(-10, 10)] == \
+        EDU['Value'].fillna(0).tolist() * 2
+    assert masked.MaskedColumn.from_series(EDU['Value'])[-1] is None
+    for row in (10, -11):
+        with pytest.raises(IndexError):
+            column[row]
+
+
+def test_isnull_matches_pandas():
+    frame = masked.MaskedFrame.from_frame(EDU)
+    for name in EDU.columns:
+        assert frame.isnull(name).to_mask().tolist() == \
+            EDU[name].isnull().tolist()
+        assert frame.isnull(name).count() == EDU[name].isnull().sum()
+    assert frame.fillna(0).isnull('Value').count() == 0
+
+
+def test_dropna_matches_pandas():
+    frame = masked.MaskedFrame.from_frame(EDU)
+    dropped = frame.dropna(subset=['Value'])
+    expected = EDU.dropna(subset=['Value'])
+    assert len(dropped) == len(expected)
+    assert dropped['Value'].materialize().tolist() == \
+        expected['Value'].tolist()
+    assert dropped['Value'].mean() == expected['Value'].mean()
+    assert dropped['Flag'].count() == expected['Flag'].count()
+    assert dropped['Flag'].sum() == expected['Flag'].sum()
+    pd.testing.assert_frame_equal(frame.dropna().to_frame(), EDU.dropna())
+    pd.testing.assert_frame_equal(dropped.to_frame(), expected)
+
+
+def test_fillna_matches_pandas():
+    frame = masked.MaskedFrame.from_frame(EDU)
+    for value in (0, {'Value': -1.0}):
+        filled = frame.fillna(value)
+        expected = EDU.fillna(value)
+        pd.testing.assert_frame_equal(filled.to_frame(), expected)
+        for name in EDU.columns:
+            column = filled[name]
+            assert column.sum() == expected[name].sum()
+            assert column.count() == expected[name].count()
+            assert column.min() == expected[name].min()
+            assert column.max() == expected[name].max()
+    pd.testing.assert_frame_equal(
+        frame.dropna(subset=['Flag']).fillna({'Value': 0}).to_frame(),
+        EDU.dropna(subset=['Flag']).fillna({'Value': 0}))
+
+
+def test_nothing_is_copied_until_materialize():
+    frame = masked.MaskedFrame.from_frame(EDU)
+    assert np.shares_memory(frame['Value'].values, EDU['Value'].to_numpy())
+    dropped = frame.dropna(subset=['Value'])
+    filled = frame.fillna({'Value': 0})
+    frame.isnull('Value')
+    dropped['Value'].mean()
+    filled['Value'].sum()
+    filled['Value'][-1]
+    assert masked.copies.bytes_copied == 0
+    dropped['Value'].materialize()
+    assert masked.copies.bytes_copied == 6 * 8
+    filled.to_frame()
+    assert masked.copies.bytes_copied == 6 * 8 + 10 * 8 * 3
@@ -0,0 +1,129 @@
+# coding: utf-8
+import os
+
+import pandas as pd
+
+import etl
+import memo
+
+
+def _edu():
+    return pd.DataFrame({'TIME': [2006, 2007, 2006],
+                         'GEO': ['A', 'A', 'B'],
+                         'Value': [1.0, 3.0, 5.0]})
+
+
+def test_in_place_change_is_not_a_hit():
+    cache = memo.ResultCache()
+    edu = _edu()
+    assert etl.mean_by_geo(edu, cache=cache).loc['A', 'Value'] == 2.0
+    edu.loc[0, 'Value'] = 100.0
+    assert etl.mean_by_geo(edu, cache=cache).loc['A', 'Value'] == 51.5
+    assert cache.stats['hits'] == 0
+
+
+def test_frame_digests_hash_each_column_once(monkeypatch):
+    hashed = []
+    column_digest = memo._column_digest
+    monkeypatch.setattr(memo, '_column_digest',
+                        lambda s: hashed.append(s.name) or column_digest(s))
+    cache = memo.ResultCache()
+    edu = _edu()
+    digests = memo.FrameDigests(edu)
+    for _ in range(3):
+        cache.call('mean', edu, ['GEO', 'Value'], etl.mean_by_geo,
+                   digests=digests)
+        cache.call('pivot', edu, ['TIME', 'GEO', 'Value'], etl.pivot_by_year,
+                   digests=digests)
+    assert sorted(hashed) == ['GEO', 'TIME', 'Value']
+    assert cache.stats['hits'] == 4
+    assert digests.fingerprint(['GEO', 'Value']) == \
+        memo.fingerprint(edu, ['GEO', 'Value'])
+
+
+def _ratings():
+    return pd.DataFrame({'title': ['X', 'X', 'Y', 'Z'],
+                         'gender': ['F', 'M', 'F', 'M'],
+                         'rating': [4, 2, 5, 3]})
+
+
+def test_subset_of_a_source_does_not_invalidate_it():
+    import movielens
+    cache = memo.ResultCache()
+    data = _ratings()
+    for _ in range(3):
+        movielens.popular_movies(data, 1, cache=cache)
+        movielens.popular_movies(data[data.gender == 'F'], 1, cache=cache)
+    assert (cache.stats['hits'], cache.stats['misses'],
+            cache.stats['invalidations']) == (4, 2, 0)
+
+
+def test_invalidate_drops_entries_written_by_another_process(tmp_path):
+    directory = str(tmp_path)
+    writer = memo.ResultCache(directory)
+    etl.mean_by_geo(_edu(), cache=writer)
+    etl.pivot_by_year(_edu(), cache=writer)
+    writer.call('sum', _edu(), ['Value'], lambda f: f.sum(), source='other')
+    reopened = memo.ResultCache(directory)
+    assert reopened.invalidate('edu') == 2
+    assert len(os.listdir(directory)) == 1
+    fresh = memo.ResultCache(directory)
+    etl.mean_by_geo(_edu(), cache=fresh)
+    fresh.call('sum', _edu(), ['Value'], lambda f: f.sum(), source='other')
+    assert (fresh.stats['misses'], fresh.stats['disk_hits']) == (1, 1)
+
+
+def test_memory_lru_evicts_least_recently_used_within_bound():
+    cache = memo.ResultCache(max_memory=1000)
+    cache.put('a', b'a' * 400)
+    cache.put('b', b'b' * 400)
+    assert cache.get('a')[0]
+    cache.put('c', b'c' * 400)
+    assert cache.memory_bytes <= 1000
+    assert [cache.get(k)[0] for k in 'abc'] == [True, False, True]
+    assert cache.stats['evictions'] == 1
+    cache.put('big', b'x' * 2000)
+    assert not cache.get('big')[0]
+
+
+def test_disk_lru_evicts_oldest_files_within_bound(tmp_path):
+    cache = memo.ResultCache(str(tmp_path), max_memory=0, max_disk=1000)
+    cache.put('a', b'a' * 400)
+    cache.put('b', b'b' * 400)
+    os.utime(cache._disk_path('a'), (1, 1))
+    os.utime(cache._disk_path('b'), (2, 2))
+    cache.put('c', b'c' * 400)
+    assert cache.disk_bytes <= 1000
+    assert cache._disk_path('a') is None
+    assert [cache.get(k) for k in 'bc'] == [(True, b'b' * 400),
+                                            (True, b'c' * 400)]
+    assert cache.stats['evictions'] == 1
+
+
+def test_counters():
+    cache = memo.ResultCache(max_memory=10 ** 6)
+    edu = _edu()
+    etl.mean_by_geo(edu, cache=cache)
+    etl.mean_by_geo(edu, cache=cache)
+    etl.pivot_by_year(edu, cache=cache)
+    assert cache.invalidate('edu') == 2
+    etl.mean_by_geo(edu, cache=cache)
+    assert cache.stats == {'hits': 1, 'memory_hits': 1, 'disk_hits': 0,
+                           'misses': 3, 'evictions': 0, 'invalidations': 2}
+    assert cache.format_stats().startswith('hits 1 (memory 1, disk 0)')
+
+
+def test_hits_return_copies(tmp_path):
+    cache = memo.ResultCache(str(tmp_path))
+    edu = _edu()
+    first = etl.mean_by_geo(edu, cache=cache)
+    first.loc['A', 'Value'] = -1.0
+    from_memory = etl.mean_by_geo(edu, cache=cache)
+    from_memory.loc['A', 'Value'] = -2.0
+    from_disk = etl.mean_by_geo(edu, cache=memo.ResultCache(str(tmp_path)))
+    from_disk.loc['A', 'Value'] = -3.0
+    assert etl.mean_by_geo(edu, cache=cache).loc['A', 'Value'] == 2.0
+    assert cache.stats['memory_hits'] == 2
+    assert memo.ResultCache(str(tmp_path)).get(
+        memo.make_key('etl.mean_by_geo', memo.fingerprint(
+            edu, ['GEO', 'Value']), {}))[1].loc['A', 'Value'] == 2.0
@@ -0,0 +1,32 @@
+# coding: utf-8
+import pandas as pd
+
+import partitions
+
+# 2000-01-01, 2000-01-02 and 2000-02-01 (UTC)
+RATINGS = pd.DataFrame({'user_id': [1, 2, 1], 'movie_id': [10, 10, 20],
+                        'rating': [4, 2, 5],
+                        'timestamp': [946684800, 946771200, 949363200]})
+
+
+def _rows(root):
+    return [p['rows'] for p in partitions.read_manifest(root)['partitions']]
+
+
+def test_write_partitions_twice_replaces(tmp_path):
+    root = str(tmp_path / 'parts')
+    partitions.write_partitions(RATINGS, root)
+    partitions.write_partitions(RATINGS.iloc[:2], root)
+    assert _rows(root) == [2]
+    assert sorted(p.name for p in (tmp_path / 'parts').iterdir()) == [
+        'manifest.json', 'month=2000-01.npz']
+
+
+def test_append_skips_rows_already_stored(tmp_path):
+    root = str(tmp_path / 'parts')
+    partitions.write_partitions(RATINGS.iloc[:2], root, mode='append')
+    partitions.write_partitions(RATINGS, root, mode='append')
+    partitions.write_partitions(RATINGS, root, mode='append')
+    assert _rows(root) == [2, 1]
+    per_day = partitions.PartitionedRatings(root).ratings_per_day()
+    assert per_day.tolist() == [1, 1, 1]
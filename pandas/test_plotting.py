@@ -0,0 +1,21 @@
+# coding: utf-8
+import matplotlib
+import pandas as pd
+
+import plotting
+
+
+def test_headless_follows_the_backend(monkeypatch):
+    for backend, expected in (('agg', True), ('pdf', True), ('macosx', False),
+                              ('QtAgg', False), ('TkAgg', False)):
+        monkeypatch.setattr(matplotlib, 'get_backend', lambda: backend)
+        assert plotting.headless() is expected
+
+
+def test_headless_plot_is_written_to_the_default_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(plotting, 'headless', lambda: True)
+    pivedu = pd.DataFrame({2006: [1.0, 2.0], 2007: [3.0, 4.0]},
+                          index=['Spain', 'France'])
+    assert plotting.plot_total_by_country(pivedu) == 'total_by_country.png'
+    assert (tmp_path / 'total_by_country.png').stat().st_size > 0
@@ -0,0 +1,49 @@
+# coding: utf-8
+import asyncio
+
+import pandas as pd
+
+import service
+
+RATINGS = pd.DataFrame({'user_id': [1, 1, 2], 'movie_id': [10, 20, 10],
+                        'rating': [4, 5, 3], 'timestamp': [1, 2, 3]})
+MOVIES = pd.DataFrame({'movie_id': [10, 20], 'title': ['A (1999)', 'B (2000)'],
+                       'genres': ['Drama', 'Comedy']})
+
+
+def _route(target):
+    index = service.RatingsIndex(RATINGS, MOVIES)
+
+    async def run():
+        return await service.QueryService(index, window=0).route(target)
+    return asyncio.run(run())[0]
+
+
+def test_route_rejects_bad_parameters():
+    assert _route('/top_movies?user=1&n=1') == 200
+    assert _route('/top_movies?user=1&n=0') == 400
+    assert _route('/top_movies?user=1&n=-3') == 400
+    assert _route('/top_movies?user=%d' % 2 ** 63) == 400
+    assert _route('/movie?id=-%d' % (2 ** 63 + 1)) == 400
+    assert _route('/movie?id=%d' % (2 ** 63 - 1)) == 404
+
+
+def test_unexpected_error_answers_500(monkeypatch):
+    index = service.RatingsIndex(RATINGS, MOVIES)
+    app = service.QueryService(index, window=0)
+
+    async def broken(target):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(app, 'route', broken)
+
+    async def run():
+        server = await asyncio.start_server(app.handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /health HTTP/1.1\r\nConnection: close\r\n\r\n')
+        status = await reader.readline()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return status
+    assert asyncio.run(run()).split()[1] == b'500'
@@ -0,0 +1,82 @@
+# coding: utf-8
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import sqlload
+
+ROWS = pd.DataFrame({'k': [1, 2, 3], 'v': ['a', 'b', 'c']})
+
+
+def _rows(conn, table='t'):
+    return conn.execute('SELECT * FROM %s ORDER BY k' % table).fetchall()
+
+
+def _objects(conn):
+    return sorted(r[0] for r in conn.execute('SELECT name FROM sqlite_master'))
+
+
+@pytest.mark.parametrize('transaction_rows', [None, 1])
+def test_duplicate_key_fails_and_keeps_the_old_table(transaction_rows):
+    conn = sqlite3.connect(':memory:')
+    sqlload.bulk_load(conn, ROWS, 't', primary_key=['k'])
+    duplicate = pd.DataFrame({'k': [4, 5, 4], 'v': ['x', 'y', 'z']})
+    with pytest.raises(sqlite3.IntegrityError):
+        sqlload.bulk_load(conn, duplicate, 't', batch_size=1,
+                          transaction_rows=transaction_rows,
+                          primary_key=['k'])
+    assert _rows(conn) == [(1, 'a'), (2, 'b'), (3, 'c')]
+    assert _objects(conn) == ['t', 'ux_t_k']
+    sqlload.bulk_load(conn, ROWS.assign(v='u'), 't', primary_key=['k'],
+                      upsert=True)
+    assert _rows(conn) == [(1, 'u'), (2, 'u'), (3, 'u')]
+
+
+@pytest.mark.parametrize('transaction_rows', [None, 2])
+def test_replace_append_and_upsert(transaction_rows):
+    conn = sqlite3.connect(':memory:')
+    more = pd.DataFrame({'k': [3, 4], 'v': ['C', 'd']})
+    options = dict(primary_key=['k'], transaction_rows=transaction_rows,
+                   batch_size=1)
+    sqlload.bulk_load(conn, ROWS, 't', **options)
+    sqlload.bulk_load(conn, more, 't', **options)
+    assert _rows(conn) == [(3, 'C'), (4, 'd')]
+    report = sqlload.bulk_load(conn, ROWS.iloc[:2], 't', if_exists='append',
+                               **options)
+    assert (report.rows, report.batches) == (2, 2)
+    assert _rows(conn) == [(1, 'a'), (2, 'b'), (3, 'C'), (4, 'd')]
+    sqlload.bulk_load(conn, ROWS, 't', upsert=True, **options)
+    assert _rows(conn) == [(1, 'a'), (2, 'b'), (3, 'c'), (4, 'd')]
+    with pytest.raises(ValueError):
+        sqlload.bulk_load(conn, ROWS, 't', if_exists='fail', **options)
+    assert _objects(conn) == ['t', 'ux_t_k']
+
+
+def test_nulls_are_stored_as_null():
+    conn = sqlite3.connect(':memory:')
+    frame = pd.DataFrame({'k': [1, 2, 3], 'x': [1.5, float('nan'), 2.5],
+                          'v': ['a', None, float('nan')],
+                          'when': pd.to_datetime(['2000-01-02 00:00:00', None,
+                                                  '2001-03-04 05:06:07'])})
+    sqlload.bulk_load(conn, frame, 't')
+    assert _rows(conn) == [(1, 1.5, 'a', '2000-01-02 00:00:00'),
+                           (2, None, None, None),
+                           (3, 2.5, None, '2001-03-04 05:06:07')]
+    types = [r[2] for r in conn.execute('PRAGMA table_info(t)')]
+    assert types == ['INTEGER', 'REAL', 'TEXT', 'TEXT']
+
+
+def test_pivot_index_is_loaded_as_key_column(tmp_path):
+    pivedu = pd.DataFrame({2006: [1.0, 2.0], 2007: [3.0, float('nan')]},
+                          index=pd.Index(['Spain', 'France'], name='GEO'))
+    pivedu.columns.name = 'TIME'
+    path = str(tmp_path / 'toolbox.sqlite')
+    report, = sqlload.load_toolbox(path, pivedu=pivedu)
+    assert (report.table, report.rows) == ('pivedu', 2)
+    conn = sqlite3.connect(path)
+    assert [r[1] for r in conn.execute('PRAGMA table_info(pivedu)')] == [
+        'GEO', '2006', '2007']
+    assert conn.execute('SELECT * FROM pivedu ORDER BY GEO').fetchall() == [
+        ('France', 2.0, None), ('Spain', 1.0, 3.0)]
+    assert 'ux_pivedu_GEO' in _objects(conn)